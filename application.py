@@ -27,6 +27,8 @@ class Application:
         Starts the programs main loop. Continuously updates it's current layer.
         When layers need to be changed, the current layer constructs and returns
         a reference to the new layer before destroying itself.
+        Every layer runs its own event loop inside update, which sleeps while
+        waiting for input, so this loop only turns when the layer changes.
         """
         while self.alive:
             self.layer = self.layer.update()
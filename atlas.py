@@ -0,0 +1,48 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the loadImages function and the image cache.
+"""
+import os
+import pyglet
+
+ATLAS_WIDTH = 256
+ATLAS_HEIGHT = 256
+
+FILENAMES = {
+    "hidden": "ruutu_selka.png",
+    "0": "ruutu_tyhja.png",
+    "1": "ruutu_1.png",
+    "2": "ruutu_2.png",
+    "3": "ruutu_3.png",
+    "4": "ruutu_4.png",
+    "5": "ruutu_5.png",
+    "6": "ruutu_6.png",
+    "7": "ruutu_7.png",
+    "8": "ruutu_8.png",
+    "mine": "ruutu_miina.png",
+    "flag": "ruutu_lippu.png"
+}
+
+#Loaded images by folder. Shared by every grid for the lifetime of the process.
+cache = {}
+
+def loadImages(path):
+    """
+    Loads the tile images from a folder and packs them into a single texture atlas,
+    so a batch of tiles is drawn with one texture bind. The images are regions of
+    the atlas texture. Every folder is only loaded once per process.
+    Params:
+        path: Filepath to the folder relative to this module.
+    """
+    if path in cache:
+        return cache[path]
+
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    atlas = pyglet.image.atlas.TextureAtlas(ATLAS_WIDTH, ATLAS_HEIGHT)
+    images = {}
+    for name, filename in FILENAMES.items():
+        images[name] = atlas.add(pyglet.image.load(os.path.join(folder, filename)))
+
+    cache[path] = images
+    return images
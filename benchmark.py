@@ -0,0 +1,296 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the benchmark suite. Run it directly to measure board
+construction, arming, floods on sparse and on empty boards, the end of game
+reveal, generation throughput and, when pyglet can be loaded, grid construction
+and draw cost, over board sizes from 9x9 up to millions of cells.
+
+Usage: python benchmark.py [--quick] [--headless] [--json FILE] [--compare FILE]
+Every result is printed and can be written as JSON. Comparing against an earlier
+JSON file exits with status 1 if anything got slower by more than the tolerance.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import board
+import session
+
+SIZES = [(9, 9, 10), (16, 16, 40), (30, 16, 99), (100, 100, 2000),
+    (500, 500, 50000), (1000, 1000, 200000), (2000, 2000, 800000)]
+FLOOD_SIZES = [(100, 100, 10), (1000, 1000, 100), (4000, 4000, 1600)]
+GENERATION_SIZES = [(9, 9, 10), (16, 16, 40), (30, 16, 99), (100, 100, 2000)]
+#The sizes run by --quick, small enough to run before every commit.
+QUICK_SIZES = SIZES[:5]
+QUICK_FLOOD_SIZES = FLOOD_SIZES[:2]
+QUICK_GENERATION_SIZES = GENERATION_SIZES[:3]
+
+DRAW_FRAMES = 100
+VIEW_WIDTH = 1280
+VIEW_HEIGHT = 800
+TOLERANCE = 0.25
+#Differences smaller than this many seconds are noise, not regressions.
+MIN_DIFFERENCE = 0.0005
+
+def best(function, repeats = 3):
+    """
+    Calls a function that returns seconds a number of times and returns the best result.
+    """
+    return min(function() for i in range(repeats))
+
+def timeConstruction(width, height, numMines):
+    """
+    Returns the time in seconds it takes to create a session and its board.
+    Params:
+        width: Width of the board in cells.
+        height: Height of the board in cells.
+        numMines: Number of mines to be armed.
+    """
+    start = time.perf_counter()
+    session.Session(width, height, numMines, 0)
+    return time.perf_counter() - start
+
+def timeFirstClick(width, height, numMines):
+    """
+    Returns the time in seconds it takes to arm a board on the first click.
+    Params:
+        width: Width of the board in cells.
+        height: Height of the board in cells.
+        numMines: Number of mines to be armed.
+    """
+    b = board.Board(width, height, numMines)
+    start = time.perf_counter()
+    b.arm(b.index(width // 2, height // 2))
+    return time.perf_counter() - start
+
+def timeFlood(width, height, numMines):
+    """
+    Returns the time in seconds it takes to reveal a board from its center.
+    With no mines at all this is the worst case, a flood over every cell.
+    Params:
+        width: Width of the board in cells.
+        height: Height of the board in cells.
+        numMines: Number of mines to be armed.
+    """
+    b = board.Board(width, height, numMines, 0)
+    index = b.index(width // 2, height // 2)
+    b.arm(index)
+    start = time.perf_counter()
+    b.reveal(index)
+    return time.perf_counter() - start
+
+def timeShowAll(width, height, numMines):
+    """
+    Returns the time in seconds it takes to reveal the rest of a board at the
+    end of a game, after a first click.
+    Params:
+        width: Width of the board in cells.
+        height: Height of the board in cells.
+        numMines: Number of mines to be armed.
+    """
+    game = session.Session(width, height, numMines, 0)
+    game.reveal(width // 2, height // 2)
+    start = time.perf_counter()
+    game.showAll()
+    return time.perf_counter() - start
+
+def measureGeneration(width, height, numMines, noGuess, duration = 1.0):
+    """
+    Returns the number of boards generated per second.
+    Params:
+        width: Width of the board in cells.
+        height: Height of the board in cells.
+        numMines: Number of mines to be armed.
+        noGuess: Generate boards that can be cleared without guessing.
+        duration: Roughly how many seconds to keep generating.
+    """
+    count = 0
+    seed = 0
+    start = time.perf_counter()
+    elapsed = 0
+    while elapsed < duration:
+        b = board.Board(width, height, numMines, seed, noGuess)
+        b.arm(b.index(width // 2, height // 2))
+        count += 1
+        seed += 1
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+def loadGraphics(headless):
+    """
+    Imports pyglet and the grid module and returns them, or (None, None) if
+    pyglet is not installed.
+    Params:
+        headless: Render offscreen, for machines without a display.
+    """
+    try:
+        import pyglet
+        if headless:
+            pyglet.options["headless"] = True
+        import grid
+    except ImportError:
+        return None, None
+    return pyglet, grid
+
+def timeGrid(gridModule, width, height, numMines):
+    """
+    Returns the time in seconds it takes to create a grid and its sprites.
+    Params:
+        gridModule: The grid module.
+        width: Width of the grid in cells.
+        height: Height of the grid in cells.
+        numMines: Number of mines to be armed.
+    """
+    start = time.perf_counter()
+    gridModule.Grid(width, height, numMines, 1.0, 0, False, VIEW_WIDTH, VIEW_HEIGHT)
+    return time.perf_counter() - start
+
+def timeDraw(pyglet, gridModule, width, height, numMines, frames = DRAW_FRAMES):
+    """
+    Returns the mean time in seconds it takes to draw a frame of a revealed
+    grid into a hidden window, waiting for the driver to finish each frame.
+    Params:
+        pyglet: The pyglet module.
+        gridModule: The grid module.
+        width: Width of the grid in cells.
+        height: Height of the grid in cells.
+        numMines: Number of mines to be armed.
+        frames: Number of frames to draw.
+    """
+    window = pyglet.window.Window(VIEW_WIDTH, VIEW_HEIGHT, visible = False)
+    try:
+        minefield = gridModule.Grid(width, height, numMines, 1.0, 0, False,
+            VIEW_WIDTH, VIEW_HEIGHT)
+        minefield.clickCell(width // 2, height // 2, 1)
+        minefield.draw()
+        pyglet.gl.glFinish()
+        start = time.perf_counter()
+        for i in range(frames):
+            window.clear()
+            minefield.draw()
+            pyglet.gl.glFinish()
+        return (time.perf_counter() - start) / frames
+    finally:
+        window.close()
+
+def result(name, width, height, numMines, seconds):
+    """
+    Returns one benchmark result as a dictionary and prints it.
+    """
+    print("{:>14} {:>12} {:>8} {:>12.3f} ms".format(
+        name, "{}x{}".format(width, height), numMines, seconds * 1000))
+    sys.stdout.flush()
+    return {"name": name, "width": width, "height": height, "mines": numMines, "seconds": seconds}
+
+def run(quick = False, headless = False):
+    """
+    Runs every benchmark and returns the results as a list of dictionaries.
+    Throughputs are stored as seconds per board, so lower is better everywhere.
+    Params:
+        quick: Skip the boards with millions of cells and the slow throughputs.
+        headless: Render offscreen.
+    """
+    sizes = QUICK_SIZES if quick else SIZES
+    floodSizes = QUICK_FLOOD_SIZES if quick else FLOOD_SIZES
+    generationSizes = QUICK_GENERATION_SIZES if quick else GENERATION_SIZES
+    duration = 0.2 if quick else 1.0
+    results = []
+
+    for width, height, numMines in sizes:
+        results.append(result("construction", width, height, numMines,
+            best(lambda: timeConstruction(width, height, numMines))))
+    for width, height, numMines in sizes:
+        results.append(result("arm", width, height, numMines,
+            best(lambda: timeFirstClick(width, height, numMines))))
+    for width, height, numMines in floodSizes:
+        results.append(result("flood", width, height, numMines,
+            best(lambda: timeFlood(width, height, numMines))))
+    for width, height, numMines in sizes:
+        results.append(result("emptyFlood", width, height, 0,
+            best(lambda: timeFlood(width, height, 0))))
+    for width, height, numMines in sizes:
+        results.append(result("showAll", width, height, numMines,
+            best(lambda: timeShowAll(width, height, numMines))))
+    for width, height, numMines in generationSizes:
+        results.append(result("generation", width, height, numMines,
+            1 / measureGeneration(width, height, numMines, False, duration)))
+        results.append(result("noGuess", width, height, numMines,
+            1 / measureGeneration(width, height, numMines, True, duration)))
+
+    pyglet, gridModule = loadGraphics(headless)
+    if gridModule:
+        for width, height, numMines in sizes:
+            results.append(result("grid", width, height, numMines,
+                best(lambda: timeGrid(gridModule, width, height, numMines))))
+        for width, height, numMines in sizes:
+            results.append(result("draw", width, height, numMines,
+                timeDraw(pyglet, gridModule, width, height, numMines)))
+    else:
+        print("pyglet is not installed, skipping grid and draw benchmarks")
+    return results
+
+def compare(results, baseline, tolerance = TOLERANCE):
+    """
+    Returns the results that got slower than in a baseline by more than the
+    tolerance, as (result, baseline seconds) tuples.
+    Params:
+        results: The results of run.
+        baseline: The results of an earlier run.
+        tolerance: Allowed slowdown as a fraction.
+    """
+    earlier = {}
+    for entry in baseline:
+        earlier[(entry["name"], entry["width"], entry["height"], entry["mines"])] = entry["seconds"]
+
+    regressions = []
+    for entry in results:
+        old = earlier.get((entry["name"], entry["width"], entry["height"], entry["mines"]))
+        if old is None:
+            continue
+        if entry["seconds"] > old * (1 + tolerance) and entry["seconds"] - old > MIN_DIFFERENCE:
+            regressions.append((entry, old))
+    return regressions
+
+def main():
+    """
+    Parses the command line, runs the benchmarks, writes and compares the results.
+    """
+    parser = argparse.ArgumentParser(description = "Benchmarks the minesweeper boards and grids.")
+    parser.add_argument("--quick", action = "store_true",
+        help = "only boards up to 500x500 and shorter throughput runs")
+    parser.add_argument("--headless", action = "store_true",
+        help = "render offscreen with pyglet's headless option")
+    parser.add_argument("--json", metavar = "FILE", help = "write the results into a JSON file")
+    parser.add_argument("--compare", metavar = "FILE",
+        help = "compare against the JSON file of an earlier run")
+    parser.add_argument("--tolerance", type = float, default = TOLERANCE,
+        help = "allowed slowdown as a fraction, 0.25 by default")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.headless)
+
+    if args.json:
+        with open(args.json, "w") as target:
+            json.dump({
+                "date": str(datetime.datetime.now()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results
+            }, target, indent = 4)
+
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for entry, old in regressions:
+            print("Slower: {} {}x{} {} mines, {:.3f} ms -> {:.3f} ms".format(entry["name"],
+                entry["width"], entry["height"], entry["mines"], old * 1000, entry["seconds"] * 1000))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against " + args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the board class.
+"""
+import random
+import solver
+
+#Every cell is packed into a single byte of the boards state array.
+#The lower four bits hold the number of neighbouring mines.
+NEIGHBOURS = 0x0F
+MINE = 0x10
+FLAG = 0x20
+VISIBLE = 0x40
+
+#Translation tables for bytes.translate, which applies them to a whole state array in C.
+CLEAR_NEIGHBOURS = bytes(b & ~NEIGHBOURS for b in range(256))
+CLEAR_VISIBLE = bytes(b & ~VISIBLE for b in range(256))
+SET_VISIBLE = bytes(b | VISIBLE for b in range(256))
+MINE_MASK = bytes(int(bool(b & MINE)) for b in range(256))
+#Hidden, unflagged empty cells that keep the flood going.
+FILL_MASK = bytes(int(not b & (VISIBLE | FLAG | MINE | NEIGHBOURS)) for b in range(256))
+#Hidden, unflagged numbered cells that stop the flood but get revealed by it.
+EDGE_MASK = bytes(int(not b & (VISIBLE | FLAG | MINE) and bool(b & NEIGHBOURS)) for b in range(256))
+REVEAL_EDGES = bytes(b | VISIBLE if EDGE_MASK[b] else b for b in range(256))
+HIDDEN_MASK = bytes(int(not b & VISIBLE) for b in range(256))
+
+def countNeighbours(state, width, height):
+    """
+    Counts the neighbouring mines of every cell of a state array into its lower bits.
+    The mine mask is read as one big integer with a byte per cell, so shifting it
+    by a byte moves every mine one cell sideways and shifting it by a row moves
+    every mine one row. Summing the eight shifted copies is a 3x3 convolution done
+    in C. No byte can carry since a count never exceeds eight.
+    Params:
+        state: A bytearray of width * height cells.
+        width: Width of the state in cells.
+        height: Height of the state in cells.
+    """
+    size = width * height
+    mines = int.from_bytes(state.translate(MINE_MASK), "little")
+    notFirstColumn = int.from_bytes((b"\x00" + b"\xff" * (width - 1)) * height, "little")
+    notLastColumn = int.from_bytes((b"\xff" * (width - 1) + b"\x00") * height, "little")
+
+    fromLeft = (mines << 8) & notFirstColumn
+    fromRight = (mines >> 8) & notLastColumn
+    row = mines + fromLeft + fromRight
+    rowBits = 8 * width
+    counts = fromLeft + fromRight + (row >> rowBits) + ((row << rowBits) & ((1 << 8 * size) - 1))
+
+    cleared = int.from_bytes(state.translate(CLEAR_NEIGHBOURS), "little")
+    state[:] = (cleared | counts).to_bytes(size, "little")
+
+class Board:
+    """
+    A class representing the state of a minefield without any graphics.
+    Cells are stored in a flat bytearray indexed with y * width + x. A resumed
+    board stores them in a copy-on-write memory map of a snapshot file instead,
+    so moves on an armed board only index and slice the state.
+    """
+    isEndless = False
+
+    def __init__(self, width, height, numMines, seed = None, noGuess = False):
+        """
+        The constructor initializes variables and allocates the state array.
+        Params:
+            width: Width of the board in cells.
+            height: Height of the board in cells.
+            numMines: Number of mines to be armed.
+            seed: Seed of the mine placement. A random seed is picked if None.
+            noGuess: Only generate boards that can be cleared without guessing.
+        """
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.numMines = numMines
+        if numMines >= self.size:
+            self.numMines = self.size - 1
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.noGuess = noGuess
+        self.isSolvable = False
+        self.isArmed = False
+        #Counters kept up to date on every change of state, so they never need a scan.
+        self.visibleCellCounter = 0
+        self.visibleMineCounter = 0
+        self.flagCounter = 0
+        self.state = bytearray(self.size)
+
+    def index(self, x, y):
+        """
+        Returns the flat index of the cell at (x, y).
+        """
+        return y * self.width + x
+
+    def coords(self, index):
+        """
+        Returns the (x, y) coordinates of the cell at a flat index.
+        """
+        y, x = divmod(index, self.width)
+        return x, y
+
+    def neighbours(self, index):
+        """
+        Returns a list of the flat indices surrounding a cell.
+        Params:
+            index: Flat index of the cell.
+        """
+        width = self.width
+        y, x = divmod(index, width)
+        left = x > 0
+        right = x < width - 1
+        arr = []
+        if y > 0:
+            row = index - width
+            if left:
+                arr.append(row - 1)
+            arr.append(row)
+            if right:
+                arr.append(row + 1)
+        if left:
+            arr.append(index - 1)
+        if right:
+            arr.append(index + 1)
+        if y < self.height - 1:
+            row = index + width
+            if left:
+                arr.append(row - 1)
+            arr.append(row)
+            if right:
+                arr.append(row + 1)
+        return arr
+
+    def isMine(self, index):
+        """
+        Is the cell at a flat index a mine or not.
+        """
+        return bool(self.state[index] & MINE)
+
+    def isFlag(self, index):
+        """
+        Is the cell at a flat index flagged or not.
+        """
+        return bool(self.state[index] & FLAG)
+
+    def isVisible(self, index):
+        """
+        Is the cell at a flat index visible or not.
+        """
+        return bool(self.state[index] & VISIBLE)
+
+    def numNeighbours(self, index):
+        """
+        Returns the number of mines surrounding the cell at a flat index.
+        """
+        return self.state[index] & NEIGHBOURS
+
+    def arm(self, safeIndex):
+        """
+        Arms the board with numMines number of mines and counts the neighbours
+        of every cell. In no guess mode the board is generated by the solver module.
+        Params:
+            safeIndex: Flat index of the one quaranteed safe cell.
+        """
+        self.isArmed = True
+        if self.noGuess:
+            self.isSolvable = solver.armSolvable(self, safeIndex)
+        else:
+            self.placeMines([safeIndex])
+            self.countNeighbours()
+
+    def placeMines(self, safeIndices):
+        """
+        Places numMines mines randomly, skipping the given cells.
+        Params:
+            safeIndices: Flat indices of cells that must not become mines.
+        """
+        state = self.state
+        safeIndices = sorted(set(safeIndices))
+
+        #Sample from a range shortened by the number of safe cells and shift each
+        #sample past the safe cells at or before it, which skips them without a freelist.
+        for index in self.random.sample(range(self.size - len(safeIndices)), self.numMines):
+            for safe in safeIndices:
+                if index >= safe:
+                    index += 1
+            state[index] |= MINE
+
+    def clearMines(self):
+        """
+        Removes every mine and resets the board into its unplayed state.
+        """
+        self.state[:] = bytes(self.size)
+        self.visibleCellCounter = 0
+        self.visibleMineCounter = 0
+        self.flagCounter = 0
+
+    def moveMine(self, source, target):
+        """
+        Moves a mine from one cell to another and updates the neighbour counts.
+        Params:
+            source: Flat index of the mine.
+            target: Flat index of the cell the mine is moved to.
+        """
+        state = self.state
+        state[source] &= ~MINE
+        for n in self.neighbours(source):
+            state[n] -= 1
+        state[target] |= MINE
+        for n in self.neighbours(target):
+            state[n] += 1
+
+    def countNeighbours(self):
+        """
+        Counts the neighbouring mines of every cell into the lower bits of the state.
+        """
+        countNeighbours(self.state, self.width, self.height)
+
+    def setVisible(self, index):
+        """
+        Sets a cell visible. Cells that already are visible are left alone.
+        Params:
+            index: Flat index of the cell.
+        """
+        state = self.state
+        if state[index] & VISIBLE:
+            return
+        state[index] |= VISIBLE
+        if state[index] & MINE:
+            self.visibleMineCounter += 1
+        else:
+            self.visibleCellCounter += 1
+
+    def toggleFlag(self, index):
+        """
+        Toggles the flag of a cell on and off.
+        Params:
+            index: Flat index of the cell.
+        """
+        self.state[index] ^= FLAG
+        if self.state[index] & FLAG:
+            self.flagCounter += 1
+        else:
+            self.flagCounter -= 1
+
+    def hideAll(self):
+        """
+        Sets every cell hidden again.
+        """
+        self.state[:] = self.state.translate(CLEAR_VISIBLE)
+        self.visibleCellCounter = 0
+        self.visibleMineCounter = 0
+
+    def showAll(self):
+        """
+        Sets every hidden cell visible. Only the runs of hidden cells are written,
+        which are found by scanning a translated copy of the state in C.
+        Returns the newly revealed cells as a list of (start, stop) spans.
+        """
+        state = self.state
+        hidden = state[:].translate(HIDDEN_MASK)
+        spans = []
+        start = hidden.find(1)
+        while start != -1:
+            stop = hidden.find(0, start)
+            if stop == -1:
+                stop = self.size
+            state[start:stop] = state[start:stop].translate(SET_VISIBLE)
+            spans.append((start, stop))
+            start = hidden.find(1, stop)
+
+        self.visibleCellCounter = self.size - self.numMines
+        self.visibleMineCounter = self.numMines
+        return spans
+
+    def status(self):
+        """
+        Returns the counters of the board as a dictionary. Every value is kept up
+        to date as the state changes, so this takes constant time.
+        """
+        return {
+            "visible": self.visibleCellCounter,
+            "hiddenSafe": self.size - self.numMines - self.visibleCellCounter,
+            "flags": self.flagCounter,
+            "minesLeft": self.numMines - self.flagCounter,
+            "minesHit": self.visibleMineCounter
+        }
+
+    def reveal(self, index):
+        """
+        Reveals a cell and floods outwards if it has no neighbouring mines.
+        Returns the newly revealed cells as a list of (start, stop) spans of flat indices.
+        Params:
+            index: Flat index of the cell.
+        """
+        state = self.state
+        if state[index] & (VISIBLE | FLAG):
+            return []
+        if state[index] & (MINE | NEIGHBOURS):
+            self.setVisible(index)
+            return [(index, index + 1)]
+        return self.flood([index])
+
+    def revealAll(self, indices):
+        """
+        Reveals several cells as one batch. Numbered cells and mines are revealed
+        one by one, but every empty cell seeds the same flood, so overlapping
+        openings are only scanned once.
+        Returns the newly revealed cells as a list of (start, stop) spans.
+        Params:
+            indices: Flat indices of the cells.
+        """
+        state = self.state
+        spans = []
+        seeds = []
+        for index in indices:
+            if state[index] & (VISIBLE | FLAG):
+                continue
+            if state[index] & (MINE | NEIGHBOURS):
+                self.setVisible(index)
+                spans.append((index, index + 1))
+            else:
+                seeds.append(index)
+        if seeds:
+            spans += self.flood(seeds)
+        return spans
+
+    def flood(self, seeds):
+        """
+        A scanline flood fill from empty cells. Every seed is widened into the
+        whole run of empty cells on its row, which is revealed with a single slice
+        assignment. The rows above and below the run are then scanned for new seeds
+        and their numbered cells are revealed. All scanning is done with translated
+        copies of the state, so the python loop runs once per run, not once per cell.
+        Returns the newly revealed cells as a list of (start, stop) spans.
+        Params:
+            seeds: Flat indices of hidden empty cells. The list is used as the work stack.
+        """
+        state = self.state
+        width = self.width
+        size = self.size
+        spans = []
+
+        while seeds:
+            seed = seeds.pop()
+            if not FILL_MASK[state[seed]]:
+                continue
+
+            rowStart = seed - seed % width
+            fill = state[rowStart:rowStart + width].translate(FILL_MASK)
+            x = seed - rowStart
+            left = fill.rfind(0, 0, x) + 1
+            right = fill.find(0, x)
+            if right == -1:
+                right = width
+            start = rowStart + left
+            stop = rowStart + right
+            state[start:stop] = state[start:stop].translate(SET_VISIBLE)
+            spans.append((start, stop))
+
+            low = max(left - 1, 0)
+            high = min(right + 1, width)
+            for row in (rowStart - width, rowStart, rowStart + width):
+                if row < 0 or row >= size:
+                    continue
+                a = row + low
+                segment = state[a:row + high]
+
+                fill = segment.translate(FILL_MASK)
+                pos = fill.find(1)
+                while pos != -1:
+                    seeds.append(a + pos)
+                    end = fill.find(0, pos)
+                    if end == -1:
+                        break
+                    pos = fill.find(1, end)
+
+                edges = segment.translate(EDGE_MASK)
+                pos = edges.find(1)
+                if pos == -1:
+                    continue
+                while pos != -1:
+                    end = edges.find(0, pos)
+                    if end == -1:
+                        end = len(edges)
+                    spans.append((a + pos, a + end))
+                    pos = edges.find(1, end)
+                state[a:row + high] = segment.translate(REVEAL_EDGES)
+
+        for start, stop in spans:
+            self.visibleCellCounter += stop - start
+
+        return spans
@@ -0,0 +1,306 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the chunked board class used by the endless mode.
+"""
+import collections
+import random
+import zlib
+import board
+
+CHUNK_SIZE = 64
+#Cells per side of an endless board. Large enough to never reach an edge by scrolling.
+ENDLESS_SIZE = 1 << 24
+MAX_CHUNKS = 1024
+MAX_LAYERS = 64
+#Below this density the openings can grow without bound, so a flood might never end.
+MIN_DENSITY = 0.15
+MAX_DENSITY = 0.8
+HIDDEN_MINE_MASK = bytes(int(not b & board.VISIBLE and bool(b & board.MINE)) for b in range(256))
+
+class ChunkedState:
+    """
+    The state array of a chunked board. Looks like a flat array of cells to
+    the session and the viewport, but every access goes to the chunk holding the cell.
+    """
+    def __init__(self, boardRef):
+        """
+        Params:
+            boardRef: A reference to the chunked board.
+        """
+        self.board = boardRef
+
+    def __len__(self):
+        return self.board.size
+
+    def __getitem__(self, index):
+        y, x = divmod(index, self.board.width)
+        chunk = self.board.getChunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        return chunk[y % CHUNK_SIZE * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def __setitem__(self, index, value):
+        y, x = divmod(index, self.board.width)
+        cx = x // CHUNK_SIZE
+        cy = y // CHUNK_SIZE
+        self.board.getChunk(cx, cy)[y % CHUNK_SIZE * CHUNK_SIZE + x % CHUNK_SIZE] = value
+        self.board.modified.add((cx, cy))
+
+class ChunkedBoard(board.Board):
+    """
+    A board too large to be stored whole. The board is split into square chunks,
+    which are generated from the seed when first needed and dropped again once
+    they are the least recently used. Chunks with revealed or flagged cells are
+    compressed instead of dropped, so memory grows with the explored area only.
+    The mines of each chunk only depend on the seed, the density, the chunk
+    and the first revealed cell, so any chunk can be generated on its own.
+    """
+    isEndless = True
+
+    def __init__(self, density, seed = None):
+        """
+        The constructor initializes variables. Nothing is generated before the first move.
+        Params:
+            density: Share of cells that are mines. Clamped between MIN_DENSITY and MAX_DENSITY.
+            seed: Seed of the mine placement. A random seed is picked if None.
+        """
+        self.width = ENDLESS_SIZE
+        self.height = ENDLESS_SIZE
+        self.size = ENDLESS_SIZE * ENDLESS_SIZE
+        self.density = min(max(density, MIN_DENSITY), MAX_DENSITY)
+        self.numMines = int(self.size * self.density)
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.noGuess = False
+        self.isSolvable = False
+        self.isArmed = False
+        self.visibleCellCounter = 0
+        self.visibleMineCounter = 0
+        self.flagCounter = 0
+        self.safeCells = frozenset()
+
+        self.chunks = collections.OrderedDict()
+        self.layers = collections.OrderedDict()
+        self.modified = set()
+        #Compressed chunks that were evicted after being changed.
+        self.spilled = {}
+        #Every cell reads as hidden and empty until the board is armed.
+        self.blank = bytes(CHUNK_SIZE * CHUNK_SIZE)
+        self.state = ChunkedState(self)
+
+    def arm(self, safeIndex):
+        """
+        Arms the board. The cell and its neighbours are kept free of mines, which
+        makes the first move open an area. The chunks are generated lazily.
+        Params:
+            safeIndex: Flat index of the one quaranteed safe cell.
+        """
+        self.isArmed = True
+        self.safeCells = frozenset([safeIndex] + self.neighbours(safeIndex))
+
+    def getChunk(self, cx, cy):
+        """
+        Returns the state of a chunk as a bytearray, loading or generating it if needed.
+        Params:
+            cx: X location of the chunk in chunks.
+            cy: Y location of the chunk in chunks.
+        """
+        if not self.isArmed:
+            return self.blank
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return self.loadChunk(key)
+        self.chunks.move_to_end(key)
+        return chunk
+
+    def loadChunk(self, key):
+        """
+        Decompresses a spilled chunk or generates a new one, and evicts the least
+        recently used chunk if there are too many in memory.
+        """
+        if key in self.spilled:
+            chunk = bytearray(zlib.decompress(self.spilled.pop(key)))
+            self.modified.add(key)
+        else:
+            chunk = self.generateChunk(*key)
+        self.chunks[key] = chunk
+
+        if len(self.chunks) > MAX_CHUNKS:
+            oldKey, oldChunk = self.chunks.popitem(last = False)
+            if oldKey in self.modified:
+                self.modified.discard(oldKey)
+                self.spilled[oldKey] = zlib.compress(oldChunk)
+        return chunk
+
+    def getMines(self, cx, cy):
+        """
+        Returns the mines of a chunk as a bytearray of MINE bits. The same chunk
+        always gets the same mines.
+        """
+        key = (cx, cy)
+        mines = self.layers.get(key)
+        if mines is not None:
+            self.layers.move_to_end(key)
+            return mines
+
+        mines = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+        if 0 <= cx < ENDLESS_SIZE // CHUNK_SIZE and 0 <= cy < ENDLESS_SIZE // CHUNK_SIZE:
+            generator = random.Random("{}:{}:{}".format(self.seed, cx, cy))
+            cells = len(mines)
+            for index in generator.sample(range(cells), round(cells * self.density)):
+                mines[index] = board.MINE
+            for index in self.safeCells:
+                y, x = divmod(index, self.width)
+                if x // CHUNK_SIZE == cx and y // CHUNK_SIZE == cy:
+                    mines[y % CHUNK_SIZE * CHUNK_SIZE + x % CHUNK_SIZE] = 0
+
+        self.layers[key] = mines
+        if len(self.layers) > MAX_LAYERS:
+            self.layers.popitem(last = False)
+        return mines
+
+    def generateChunk(self, cx, cy):
+        """
+        Generates the state of a chunk. The mines of the surrounding chunks are
+        copied around it with a border of one cell, so the neighbours can be
+        counted across chunk edges with board.countNeighbours.
+        """
+        size = CHUNK_SIZE
+        padded = size + 2
+        around = [[self.getMines(cx + i, cy + j) for i in (-1, 0, 1)] for j in (-1, 0, 1)]
+
+        rows = []
+        for j, sourceRow in ((0, size - 1), *((1, r) for r in range(size)), (2, 0)):
+            left, middle, right = around[j]
+            start = sourceRow * size
+            rows.append(left[start + size - 1:start + size])
+            rows.append(middle[start:start + size])
+            rows.append(right[start:start + 1])
+        state = bytearray(b"".join(rows))
+        board.countNeighbours(state, padded, padded)
+
+        return bytearray(b"".join(state[(r + 1) * padded + 1:(r + 1) * padded + 1 + size]
+            for r in range(size)))
+
+    def flood(self, seeds):
+        """
+        A scanline flood fill from empty cells like the one of the board, except
+        that the runs end at chunk edges. Rows are scanned one chunk at a time.
+        Returns the newly revealed cells as a list of (start, stop) spans.
+        Params:
+            seeds: Flat indices of hidden empty cells. The list is used as the work stack.
+        """
+        width = self.width
+        size = CHUNK_SIZE
+        spans = []
+
+        while seeds:
+            seed = seeds.pop()
+            y, x = divmod(seed, width)
+            cx = x // size
+            cy = y // size
+            chunk = self.getChunk(cx, cy)
+            rowStart = y % size * size
+            lx = x % size
+            if not board.FILL_MASK[chunk[rowStart + lx]]:
+                continue
+
+            fill = chunk[rowStart:rowStart + size].translate(board.FILL_MASK)
+            left = fill.rfind(0, 0, lx) + 1
+            right = fill.find(0, lx)
+            if right == -1:
+                right = size
+            a = rowStart + left
+            b = rowStart + right
+            chunk[a:b] = chunk[a:b].translate(board.SET_VISIBLE)
+            self.modified.add((cx, cy))
+            first = y * width + cx * size
+            spans.append((first + left, first + right))
+            self.visibleCellCounter += right - left
+
+            low = max(cx * size + left - 1, 0)
+            high = min(cx * size + right + 1, width)
+            for row in (y - 1, y, y + 1):
+                if 0 <= row < self.height:
+                    self.scan(row, low, high, seeds, spans)
+
+        return spans
+
+    def scan(self, y, low, high, seeds, spans):
+        """
+        Adds the empty cells of a row segment to the seeds and reveals its numbered
+        cells, one chunk at a time.
+        Params:
+            y: The row.
+            low: X location of the first cell of the segment.
+            high: X location after the last cell of the segment.
+            seeds: The work stack of the flood.
+            spans: The spans revealed by the flood.
+        """
+        size = CHUNK_SIZE
+        cy = y // size
+        rowStart = y % size * size
+        while low < high:
+            cx = low // size
+            chunkX = cx * size
+            stop = min(high, chunkX + size)
+            chunk = self.getChunk(cx, cy)
+            a = rowStart + low - chunkX
+            b = rowStart + stop - chunkX
+            first = y * self.width + chunkX - rowStart
+            segment = chunk[a:b]
+
+            fill = segment.translate(board.FILL_MASK)
+            pos = fill.find(1)
+            while pos != -1:
+                seeds.append(first + a + pos)
+                end = fill.find(0, pos)
+                if end == -1:
+                    break
+                pos = fill.find(1, end)
+
+            edges = segment.translate(board.EDGE_MASK)
+            pos = edges.find(1)
+            if pos != -1:
+                while pos != -1:
+                    end = edges.find(0, pos)
+                    if end == -1:
+                        end = len(edges)
+                    spans.append((first + a + pos, first + a + end))
+                    self.visibleCellCounter += end - pos
+                    pos = edges.find(1, end)
+                chunk[a:b] = segment.translate(board.REVEAL_EDGES)
+                self.modified.add((cx, cy))
+            low = stop
+
+    def showAll(self):
+        """
+        Sets every hidden cell of the chunks in memory visible. The rest of the
+        board is never shown, so it is left ungenerated.
+        Returns the newly revealed cells as a list of (start, stop) spans.
+        """
+        size = CHUNK_SIZE
+        spans = []
+        for (cx, cy), chunk in self.chunks.items():
+            hidden = chunk.translate(board.HIDDEN_MASK).count(1)
+            hiddenMines = chunk.translate(HIDDEN_MINE_MASK).count(1)
+            self.visibleCellCounter += hidden - hiddenMines
+            self.visibleMineCounter += hiddenMines
+            chunk[:] = chunk.translate(board.SET_VISIBLE)
+            self.modified.add((cx, cy))
+            for r in range(size):
+                first = (cy * size + r) * self.width + cx * size
+                spans.append((first, first + size))
+        return spans
+
+    def status(self):
+        """
+        Returns the counters of the board as a dictionary. An endless board has no
+        known number of hidden safe cells or remaining mines, so those are None.
+        """
+        status = super().status()
+        status["hiddenSafe"] = None
+        status["minesLeft"] = None
+        return status
@@ -4,90 +4,202 @@ Minesweeper by Jere Koivisto 2020
 This module contains the game class.
 """
 
+import atexit
+import collections
+import threading
+import time
 import pyglet
 import grid
+import gui
+import instrument
 import menu
+import replay
+import snapshot
+import stats
 import submit
 
 SPRITE_WIDTH = 40
 SPRITE_HEIGHT = 40
+MAX_WINDOW_WIDTH = 1280
+MAX_WINDOW_HEIGHT = 800
+PAN_SPEED = 600
+ZOOM_STEP = 1.1
+FRAME_TIME = 1/60
+END_DELAY = 2
+PAN_KEYS = (pyglet.window.key.LEFT, pyglet.window.key.RIGHT, pyglet.window.key.UP,
+    pyglet.window.key.DOWN)
+
+#The window shared by every game. Created by the first game and hidden in between.
+window = None
+
+def getWindow(width, height):
+    """
+    Returns the shared game window resized and shown. The window and its GL
+    context are only created on first use, so later games start faster and
+    the texture atlas stays valid. The window is closed when the program exits.
+    Params:
+        width: Width of the window in pixels.
+        height: Height of the window in pixels.
+    """
+    global window
+    if window is None:
+        window = pyglet.window.Window(
+            width,
+            height,
+            fullscreen = False
+            )
+        atexit.register(closeWindow)
+    else:
+        window.set_size(width, height)
+        window.set_visible(True)
+    return window
+
+def closeWindow():
+    """
+    Closes the shared game window.
+    """
+    global window
+    if window is not None:
+        window.close()
+        window = None
 
 class Game:
     """
     The most important layer class. This layer encaptulates a game of minesweeper.
+    Given a replay, the game plays it back at real time instead of taking clicks.
+    Closing the window in the middle of a game saves it into a snapshot.
+    Frames are only scheduled when something changes, so an idle game sleeps.
     """
-    def __init__(self, width, height, numMines, spriteScale = 1.0):
+    def __init__(self, width, height, numMines, spriteScale = 1.0, seed = None, noGuess = False,
+            recording = None, savedGame = None, isEndless = False):
         """
-        The contructor initializes variables including a pyglet window,
-        sets event handlers and schedules the simulation method.
+        The contructor initializes variables, takes the shared pyglet window
+        and pushes its event handlers. The first frame is scheduled by update.
         Params:
             width: Width of the minefield in cells.
             height: Height of the minefield in cells.
             numMines: Number of mines to be armed.
             spriteScale: Scales graphics by a factor.
+            seed: Seed of the mine placement. A random seed is picked if None.
+            noGuess: Only generate minefields that can be cleared without guessing.
+            recording: A replay to play back. Must match the other parameters.
+            savedGame: A snapshot.Snapshot to resume. Must match the other parameters.
+            isEndless: Play on an endless board with the mine density of the given size.
+                The window is sized as for the given size.
         """
         self.next = self
 
+        self.startTime = time.perf_counter()
+        self.lastFrame = self.startTime
         self.timer = 0
-        self.endTimer = 0
-
-        self.input = {
-            "hasInput": False,
-            "button": 0,
-            "x": 0,
-            "y": 0
-        }
-
-        mines = numMines
-        if mines >= width * height:
-            mines = width * height - 1
-
-        self.window = pyglet.window.Window(
-            int(width * SPRITE_WIDTH * spriteScale),
-            int(height * SPRITE_HEIGHT * spriteScale),
-            fullscreen = False
-            )
-        self.window.set_caption("W:" + str(width) + " H:" + str(height) + " M:" + str(mines))
+        self.isFinishing = False
+        self.needsRedraw = True
+        #Computes the difficulty metrics while the ended game is still shown.
+        self.analysis = None
+
+        #Clicks waiting to be applied in order, as (timestamp, x, y, button) tuples.
+        self.inputQueue = collections.deque()
+        #Moves of the replay being played back, as (time, index, action) tuples.
+        self.playback = None
+        if recording is not None:
+            pos = replay.readHeader(recording)[-1]
+            self.playback = collections.deque(replay.readMoves(recording, pos))
 
-        self.minefield = grid.Grid(width, height, numMines, spriteScale)
+        windowWidth = min(int(width * SPRITE_WIDTH * spriteScale), MAX_WINDOW_WIDTH)
+        windowHeight = min(int(height * SPRITE_HEIGHT * spriteScale), MAX_WINDOW_HEIGHT)
+        gui.hide()
+        self.window = getWindow(windowWidth, windowHeight)
+        self.keys = pyglet.window.key.KeyStateHandler()
+        self.window.push_handlers(self.keys)
+        #Pushed on top of the key state handler, which still sees every key. The
+        #handlers set below go into the same frame, so update pops both frames.
+        self.window.push_handlers(on_key_press = lambda symbol, modifiers: self.wake())
 
-        pyglet.clock.schedule_interval(self.simulate, 1/60)
+        self.minefield = grid.Grid(width, height, numMines, spriteScale, seed, noGuess,
+            windowWidth, windowHeight, isEndless)
+        self.isResumed = savedGame is not None
+        if self.isResumed:
+            savedGame.restore(self.minefield)
+            self.timer = savedGame.timer
+            self.startTime -= savedGame.timer
+
+        self.shownFlags = None
+        self.updateCaption()
+
+        #The live timing overlay, only shown while instrumentation is enabled.
+        self.overlay = None
+        self.overlayTime = 0
+        if instrument.enabled:
+            self.overlay = pyglet.text.Label("", x = 5, y = windowHeight - 5, anchor_y = "top",
+                multiline = True, width = 400, color = (255, 0, 0, 255))
+
+        @self.window.event
+        def on_expose():
+            self.needsRedraw = True
+            self.wake()
+
+        @self.window.event
+        def on_resize(width, height):
+            self.needsRedraw = True
+            self.wake()
 
         @self.window.event
         def on_close():
+            self.timer = time.perf_counter() - self.startTime
+            #Endless boards are not saved, their state is not one array.
+            if (self.playback is None and self.minefield.isArmed and not self.minefield.hasEnded
+                    and not self.minefield.board.isEndless):
+                snapshot.save(self.minefield, self.timer)
             self.next = menu.Menu()
+            #The window is hidden by update instead of being closed.
+            return pyglet.event.EVENT_HANDLED
 
         @self.window.event
         def on_mouse_press(x, y, button, modifiers):
-            self.input["x"] = int(x / (SPRITE_WIDTH * spriteScale))
-            self.input["y"] = int(y / (SPRITE_HEIGHT * spriteScale))
-            self.input["button"] = button
-            self.input["hasInput"] = True
-
-            if self.input["x"] < 0:
-                self.input["x"] = 0
-            if self.input["y"] < 0:
-                self.input["y"] = 0
-            if self.input["x"] >= self.minefield.width - 1:
-                self.input["x"] = self.minefield.width - 1
-            if self.input["y"] >= self.minefield.height - 1:
-                self.input["y"] = self.minefield.height - 1
+            coords = self.minefield.viewport.cellAt(x, y)
+            if coords and self.playback is None:
+                self.inputQueue.append((time.perf_counter(), coords[0], coords[1], button))
+                self.wake()
+
+        @self.window.event
+        def on_mouse_scroll(x, y, scroll_x, scroll_y):
+            self.minefield.viewport.zoom(ZOOM_STEP ** scroll_y, x, y)
+            self.wake()
 
         #print("game created")
 
     def update(self):
         """
-        The update function called by the application. Progresses pyglets clock and
-        processes events.
+        The update function called by the application. Runs pyglets events and
+        scheduled functions until the layer changes. In between it blocks until the
+        next event arrives or the next scheduled function is due, so an idle game
+        uses no CPU and input is handled as soon as it arrives.
         """
-        pyglet.clock.tick()
+        eventLoop = pyglet.app.platform_event_loop
+        eventLoop.start()
+        self.wake()
 
-        event = self.window.dispatch_events()
+        while self.next == self:
+            #None when nothing is scheduled, which blocks until the next event.
+            timeout = pyglet.clock.get_sleep_time(True)
+            if instrument.enabled:
+                #Sleeping and dispatching the events can't be told apart from here,
+                #so the "idle" timing holds both. The handlers only queue work for
+                #the next frame, which is timed on its own.
+                start = time.perf_counter()
+                eventLoop.step(timeout)
+                instrument.record("idle", start, time.perf_counter() - start)
+            else:
+                eventLoop.step(timeout)
+            pyglet.clock.tick(True)
 
-        if not self.next == self:
-            pyglet.clock.unschedule(self.simulate)
-            self.window.close()
-            del self.window
+        eventLoop.stop()
+        pyglet.clock.unschedule(self.simulate)
+        pyglet.clock.unschedule(self.finish)
+        self.window.pop_handlers()
+        self.window.pop_handlers()
+        self.window.set_visible(False)
+        del self.window
 
         return self.next
 
@@ -95,28 +207,131 @@ class Game:
         #print("game destroyed")
         pass
 
+    def wake(self):
+        """
+        Schedules a frame right away. Called by every event that changes the game
+        or the window, so several events dispatched together share one frame.
+        """
+        pyglet.clock.unschedule(self.simulate)
+        pyglet.clock.schedule_once(self.simulate, 0)
+
     def simulate(self, delta):
         """
-        The scheduled simulation function. Checks for input and calls
-        the input handling method.
-        """
-        self.timer += delta
-        self.draw()
-
-        if self.minefield.hasEnded:
-            self.endTimer += delta
-            if self.endTimer > 2:
-                self.next = submit.Submit(
-                    "stats.txt",
-                    not self.minefield.hasFailed,
-                    self.timer,
-                    self.minefield.moveCounter,
-                    self.minefield.width,
-                    self.minefield.height,
-                    self.minefield.numMines)
+        The scheduled simulation function. Applies every queued click before drawing,
+        so clicks are shown in the same frame they are handled. The frame is only
+        redrawn when the minefield has changed or the window needs repainting, and
+        the next frame is only scheduled if something keeps moving.
+        """
+        now = time.perf_counter()
+        #After sleeping the first frame only pans as far as one frame would.
+        self.pan(min(now - self.lastFrame, FRAME_TIME))
+        self.lastFrame = now
+        self.timer = now - self.startTime
+
+        if self.playback is not None:
+            self.playBack()
+        else:
+            self.handleInput()
+        if self.minefield.hasEnded and not self.isFinishing:
+            self.isFinishing = True
+            if self.isResumed:
+                #Right away, since closing the window during the delay skips finish.
+                #This also copies the state off the file before the analysis reads it.
+                snapshot.discard(gridRef = self.minefield)
+            if self.playback is None:
+                #The metrics take seconds on the largest boards, so they are computed
+                #in the background during the delay instead of stalling the frames.
+                self.analysis = threading.Thread(target = self.minefield.analyse, daemon = True)
+                self.analysis.start()
+            pyglet.clock.schedule_once(self.finish, END_DELAY)
+        if self.minefield.board.flagCounter != self.shownFlags:
+            self.updateCaption()
+        if self.overlay:
+            self.updateOverlay(now)
+
+        if self.needsRedraw or self.minefield.isDirty:
+            self.draw()
+
+        delay = self.nextFrame()
+        if delay is not None:
+            pyglet.clock.schedule_once(self.simulate, delay)
+
+    def nextFrame(self):
+        """
+        Returns the seconds until the next frame is needed, or None if nothing
+        moves and the game can sleep until the next event.
+        """
+        delays = []
+        if any(self.keys[symbol] for symbol in PAN_KEYS):
+            delays.append(FRAME_TIME)
+        if self.playback and not self.minefield.hasEnded:
+            delays.append(max(self.playback[0][0] - self.timer, 0))
+        if self.overlay:
+            delays.append(max(self.overlayTime + instrument.OVERLAY_INTERVAL - self.lastFrame, 0))
+        return min(delays) if delays else None
+
+    def finish(self, delta):
+        """
+        Scheduled a moment after the game has ended. Changes the layer into
+        the submit window once the metrics are ready, or back into the menu
+        after a replay.
+        """
+        if self.playback is not None:
+            #Replays are already stored, so watching one ends back in the menu.
+            self.next = menu.Menu()
+            return
+        self.analysis.join()
+        self.next = submit.Submit(
+            stats.DATABASE,
+            not self.minefield.hasFailed,
+            self.timer,
+            self.minefield.moveCounter,
+            self.minefield.width,
+            self.minefield.height,
+            self.minefield.numMines,
+            self.minefield.recorder.getBytes(),
+            self.minefield.analyse(),
+            self.minefield.board.isEndless)
+
+    def updateCaption(self):
+        """
+        Shows the size, the mine counter and the seed of the minefield in the caption.
+        An endless minefield shows the number of flags instead of the mine counter.
+        """
+        field = self.minefield
+        self.shownFlags = field.board.flagCounter
+        if field.board.isEndless:
+            caption = ("Endless W:" + str(field.width) + " H:" + str(field.height)
+                + " M:" + str(field.numMines) + " F:" + str(self.shownFlags))
         else:
-            if self.input["hasInput"]:
-                self.handleInput()
+            caption = ("W:" + str(field.width) + " H:" + str(field.height)
+                + " M:" + str(field.minesLeft) + "/" + str(field.numMines))
+        caption += " S:" + str(field.board.seed)
+        if self.playback is not None:
+            caption = "Replay " + caption
+        self.window.set_caption(caption)
+
+    def updateOverlay(self, now):
+        """
+        Refreshes the timing overlay a few times a second. Frames are only drawn
+        when something changes, so the overlay shows the frames actually drawn.
+        Params:
+            now: The time.perf_counter value of the frame.
+        """
+        if now - self.overlayTime >= instrument.OVERLAY_INTERVAL:
+            self.overlayTime = now
+            self.overlay.text = instrument.overlayText()
+            self.needsRedraw = True
+
+    def pan(self, delta):
+        """
+        Pans the viewport while the arrow keys are held down.
+        """
+        key = pyglet.window.key
+        dx = (self.keys[key.RIGHT] - self.keys[key.LEFT]) * PAN_SPEED * delta
+        dy = (self.keys[key.UP] - self.keys[key.DOWN]) * PAN_SPEED * delta
+        if dx or dy:
+            self.minefield.viewport.pan(dx, dy)
 
     def draw(self):
         """
@@ -125,12 +340,33 @@ class Game:
         self.window.clear()
 
         self.minefield.draw()
+        if self.overlay:
+            self.overlay.draw()
 
         self.window.flip()
+        self.minefield.isDirty = False
+        self.needsRedraw = False
 
     def handleInput(self):
         """
-        Handles input and progresses the game.
+        Handles input and progresses the game. Drains the input queue in order.
+        Clicks after the end of the game are dropped. While instrumentation is
+        enabled, the seconds from every click to the moment it was applied are
+        recorded as the "latency" timing.
+        """
+        queue = self.inputQueue
+        while queue and not self.minefield.hasEnded:
+            timestamp, x, y, button = queue.popleft()
+            self.minefield.clickCell(x, y, button, timestamp)
+            if instrument.enabled:
+                instrument.record("latency", timestamp, time.perf_counter() - timestamp)
+        queue.clear()
+
+    def playBack(self):
+        """
+        Plays the moves of the replay whose time has come.
         """
-        self.minefield.clickCell(self.input["x"], self.input["y"], self.input["button"])
-        self.input["hasInput"] = False
+        moves = self.playback
+        while moves and moves[0][0] <= self.timer and not self.minefield.hasEnded:
+            moveTime, index, action = moves.popleft()
+            self.minefield.playMove(index, action)
@@ -3,16 +3,23 @@ Minesweeper by Jere Koivisto 2020
 
 This module contains the grid class.
 """
-import random
+import time
 import pyglet
+import atlas
 import cell
+import metrics
+import replay
+import session
+import viewport
 
 class Grid:
     """
     A class representing the minefield. Essentially a grid build from
-    cells.
+    cells, which are viewed through a scrollable viewport. The rules of the
+    game are left to a headless session. Every move is recorded into a replay.
     """
-    def __init__(self, width, height, numMines, spriteScale = 1.0):
+    def __init__(self, width, height, numMines, spriteScale = 1.0, seed = None, noGuess = False,
+            viewWidth = None, viewHeight = None, isEndless = False):
         """
         The constructor initializes variables.
         Params:
@@ -20,42 +27,45 @@ class Grid:
             hieght: Height of the grid in cells.
             numMines: Number of mines to be armed.
             spriteScale: Scales the width of sprites by a factor.
-        """
+            seed: Seed of the mine placement. A random seed is picked if None.
+            noGuess: Only generate minefields that can be cleared without guessing.
+            viewWidth: Width of the viewport in pixels. Fits the whole grid if None.
+            viewHeight: Height of the viewport in pixels. Fits the whole grid if None.
+            isEndless: Play on an endless board with the mine density of the given size.
+                The size and number of mines are kept as given.
+        """
+        self.session = session.Session(width, height, numMines, seed, noGuess, isEndless)
+        self.board = self.session.board
         self.width = width
         self.height = height
         self.numMines = numMines
-        if numMines >= width * height:
-            self.numMines = width * height - 1
-        self.moveCounter = 0
-        self.isArmed = False
-        self.hasEnded = False
-        self.hasFailed = False
+        if not isEndless:
+            self.numMines = self.board.numMines
+        self.recorder = replay.Recorder(width, height, self.numMines, self.board.seed, noGuess,
+            isEndless)
         self.images = self.loadImages("spritet")
         self.drawBuffer = pyglet.graphics.Batch()
-        self.visibleCellCounter = 0
-
-        self.field = []
-        for i in range(height):
-            self.field.append([])
-            for j in range(width):
-                self.field[i].append(cell.Cell(self, j, i, False, spriteScale))
+        #Set whenever a sprite changes, cleared by the game once the frame is drawn.
+        self.isDirty = True
+        #Difficulty metrics of the minefield, computed by analyse.
+        self.metrics = None
+
+        if viewWidth is None:
+            viewWidth = int(width * cell.SPRITE_WIDTH * spriteScale)
+        if viewHeight is None:
+            viewHeight = int(height * cell.SPRITE_HEIGHT * spriteScale)
+        self.viewport = viewport.Viewport(self, viewWidth, viewHeight, spriteScale)
+        if isEndless:
+            self.viewport.center(self.board.width // 2, self.board.height // 2)
 
     def loadImages(self, path):
         """
-        Loads images from a folder and returns them.
+        Loads images from a folder and returns them. The images are shared
+        regions of one texture atlas that is only loaded on the first game.
         Params:
             path: Filepath to the folder.
         """
-        pyglet.resource.path = [path]
-        images = {}
-        images["hidden"] = pyglet.resource.image("ruutu_selka.png")
-        images["0"] = pyglet.resource.image("ruutu_tyhja.png")
-        for i in range(1, 9):
-            images[str(i)] = pyglet.resource.image("ruutu_{}.png".format(i))
-        images["mine"] = pyglet.resource.image("ruutu_miina.png")
-        images["flag"] = pyglet.resource.image("ruutu_lippu.png")
-
-        return images
+        return atlas.loadImages(path)
 
     def getImage(self, imgName):
         """
@@ -65,81 +75,92 @@ class Grid:
         """
         return self.images[imgName]
 
-    def arm(self, safeCoord):
+    @property
+    def isArmed(self):
         """
-        Arms the minefield with numMines number of mines. One cell is quaranteed safe and
-        it's going to be the first clicked cell.
-        Params:
-            safeCoord: A tuple containing the (x, y) coordinates of the one
-                        quaranteed safe cell.
+        Has the minefield been armed yet.
         """
-        self.isArmed = True
-
-        freelist = []
-        for i in range(self.height):
-            for j in range(self.width):
-                freelist.append((j, i))
-
-        freelist.remove(safeCoord)
-
-        random.seed()
-        for k in range(self.numMines):
-            index = random.randint(0, len(freelist) - 1)
-            pos = freelist[index]
-            del freelist[index]
-            self.field[pos[1]][pos[0]].isMine = True
+        return self.board.isArmed
 
-        for i in range(self.height):
-            for j in range(self.width):
-                self.field[i][j].countNeighbours()
-
-    def clickCell(self, x, y, button):
+    @property
+    def moveCounter(self):
         """
-        A method called in the game layer. Determines what happens when a cell is clicked.
+        The number of moves played so far.
         """
-        cell = self.field[y][x]
-        if cell.isVisible:
-            pass
-        else:
-            if not self.isArmed:
-                self.arm((x, y))
+        return self.session.moveCounter
 
-            if button == 4:
-                cell.toggleFlag()
-                self.moveCounter += 1
-            else:
-                if cell.isFlag:
-                    pass
-                else:
-                    self.moveCounter += 1
-                    self.revealCell(cell)
+    @property
+    def hasEnded(self):
+        """
+        Has the game ended or not.
+        """
+        return self.session.hasEnded
 
+    @property
+    def hasFailed(self):
+        """
+        Did the player blow up or not.
+        """
+        return self.session.hasFailed
 
-        if self.checkWin() and not self.hasFailed:
-            self.win()
+    @property
+    def visibleCellCounter(self):
+        """
+        The number of cells set visible so far.
+        """
+        return self.board.visibleCellCounter
 
-    def checkWin(self):
+    @property
+    def minesLeft(self):
         """
-        Checks if the win condition of minesweeper (All safe cells are revealed) is met.
+        The number of mines minus the number of flags, as shown by the mine counter.
+        None on an endless board.
         """
-        cellCount = self.width * self.height - self.numMines
-        return self.visibleCellCounter == cellCount
+        return self.board.status()["minesLeft"]
 
-    def win(self):
+    def clickCell(self, x, y, button, timestamp = None):
         """
-        A method for initiating the victory proceedings.
+        A method called in the game layer. Determines what happens when a cell is clicked.
+        The right button flags. The middle button, or any other button on a visible
+        number, chords.
+        Params:
+            x: X location of the cell.
+            y: Y location of the cell.
+            button: The pyglet mouse button that was clicked.
+            timestamp: The time.perf_counter value of the click. Defaults to now.
+        """
+        index = self.board.index(x, y)
+        if button == 4:
+            action = replay.FLAG
+        elif button == 2 or self.board.isVisible(index):
+            action = replay.CHORD
+        else:
+            action = replay.REVEAL
+        self.playMove(index, action, timestamp)
+
+    def playMove(self, index, action, timestamp = None):
         """
-        self.showAll()
-        self.hasFailed = False
-        self.hasEnded = True
+        Plays a move and records it if it changed anything.
+        Params:
+            index: Flat index of the cell.
+            action: replay.REVEAL, replay.FLAG or replay.CHORD.
+            timestamp: The time.perf_counter value of the move. Defaults to now.
+        """
+        spans = replay.apply(self.session, index, action)
+        if spans:
+            if timestamp is None:
+                timestamp = time.perf_counter()
+            self.recorder.record(timestamp, index, action)
+            self.updateCells(spans)
 
-    def fail(self):
+    def analyse(self):
         """
-        A method for initiating the failure proceedings.
+        Computes the difficulty metrics of the armed minefield once and returns them,
+        see the metrics module. Returns None before arming and for endless minefields.
         """
-        self.showAll()
-        self.hasFailed = True
-        self.hasEnded = True
+        if self.metrics is None and self.board.isArmed and not self.board.isEndless:
+            self.metrics = metrics.analyse(self.board)
+        return self.metrics
 
     def draw(self):
         """
@@ -147,23 +168,8 @@ class Grid:
         """
         self.drawBuffer.draw()
 
-    def showAll(self):
-        """
-        Sets all cells visible.
-        """
-        for i in range(self.height):
-            for j in range(self.width):
-                self.field[i][j].setVisibility(True)
-
-    def revealCell(self, cell):
+    def updateCells(self, spans):
         """
-        Calls cells reveal method and is in charge of flooding.
+        Updates the sprites of the cells in a list of (start, stop) spans of flat indices.
         """
-        arr = [cell]
-
-        while arr:
-            c = arr[-1]
-            arr.pop()
-            startFlood = c.reveal()
-            if startFlood:
-                arr.extend(c.flood())
+        self.viewport.updateSpans(spans)
@@ -0,0 +1,54 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the tkinter root shared by the tkinter layers.
+
+Creating a Tk root is slow, so one root lives for the whole program. Every
+layer builds its widgets into a frame of its own and only destroys that frame
+when it is done. The root is hidden while a game is played.
+"""
+import tkinter as tk
+
+root = None
+
+def getRoot(title):
+    """
+    Returns the shared root, creating it on first use, and shows it with a title
+    and its natural size.
+    Params:
+        title: Title of the window.
+    """
+    global root
+    if root is None:
+        root = tk.Tk()
+        root.resizable(False, False)
+    root.title(title)
+    root.geometry("")
+    root.deiconify()
+    return root
+
+def leave(frame):
+    """
+    Destroys the frame of a layer and returns from the mainloop of the root,
+    so the application can change the layer. The root is kept.
+    Params:
+        frame: The frame holding the widgets of the layer.
+    """
+    frame.destroy()
+    root.quit()
+
+def hide():
+    """
+    Hides the root while the layer has no tkinter widgets.
+    """
+    if root is not None:
+        root.withdraw()
+
+def close():
+    """
+    Destroys the root when the program ends.
+    """
+    global root
+    if root is not None:
+        root.destroy()
+        root = None
@@ -0,0 +1,155 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the opt-in timing instrumentation of the game loop.
+
+Nothing is timed until enable is called. It wraps the methods listed in
+TARGETS, so the game runs the original methods when instrumentation is off.
+The game records two more timings itself while instrumentation is on: "idle",
+each step of the event loop, which is the time spent sleeping until input or a
+timer is due plus dispatching the events, and "latency", the time from a click
+to the moment it was applied.
+"""
+import collections
+import csv
+import functools
+import importlib
+import json
+import time
+
+MAX_SAMPLES = 100000
+OVERLAY_INTERVAL = 0.5
+
+#Methods timed by enable, as (module, class, method, timing name). The modules are
+#imported by enable, so the game can import this module without a cycle.
+TARGETS = [
+    ("game", "Game", "simulate", "frame"),
+    ("game", "Game", "handleInput", "input"),
+    ("game", "Game", "draw", "draw"),
+    ("grid", "Grid", "clickCell", "clickCell"),
+    ("session", "Session", "reveal", "reveal"),
+    ("session", "Session", "chord", "chord"),
+    ("board", "Board", "arm", "arm"),
+    #Layer changes, from a click in one layer to the next layer being ready.
+    ("game", "Game", "__init__", "openGame"),
+    ("menu", "Menu", "__init__", "openMenu"),
+    ("submit", "Submit", "__init__", "openSubmit"),
+    ("scores", "Scores", "__init__", "openScores"),
+]
+
+enabled = False
+#Recent (start, seconds) samples of every timing name.
+samples = collections.defaultdict(lambda: collections.deque(maxlen = MAX_SAMPLES))
+originals = {}
+#Process and wall clock times at enable and at the previous cpuUsage call.
+cpuStart = (0, 0)
+cpuMark = (0, 0)
+
+def record(name, start, elapsed):
+    """
+    Stores one sample.
+    Params:
+        name: Name of the timing.
+        start: The time.perf_counter value at the start.
+        elapsed: Seconds taken.
+    """
+    samples[name].append((start, elapsed))
+
+def wrap(function, name):
+    """
+    Returns a version of a function that records how long every call takes.
+    """
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, start, time.perf_counter() - start)
+    return timed
+
+def enable():
+    """
+    Starts timing the methods in TARGETS.
+    """
+    global enabled, cpuStart, cpuMark
+    if enabled:
+        return
+    enabled = True
+    cpuStart = cpuMark = (time.process_time(), time.perf_counter())
+    for module, className, method, name in TARGETS:
+        cls = getattr(importlib.import_module(module), className)
+        function = getattr(cls, method)
+        originals[(cls, method)] = function
+        setattr(cls, method, wrap(function, name))
+
+def disable():
+    """
+    Puts the original methods back. The samples are kept.
+    """
+    global enabled
+    for (cls, method), function in originals.items():
+        setattr(cls, method, function)
+    originals.clear()
+    enabled = False
+
+def cpuUsage():
+    """
+    Returns the share of one core the process has used since the previous call.
+    An idle game should stay close to zero.
+    """
+    global cpuMark
+    previous = cpuMark
+    cpuMark = (time.process_time(), time.perf_counter())
+    return (cpuMark[0] - previous[0]) / max(cpuMark[1] - previous[1], 1e-9)
+
+def summary():
+    """
+    Returns a dictionary of statistics in milliseconds for every timing name,
+    and the share of one core used since enable under "cpu".
+    """
+    now = (time.process_time(), time.perf_counter())
+    result = {"cpu": (now[0] - cpuStart[0]) / max(now[1] - cpuStart[1], 1e-9)}
+    for name, values in samples.items():
+        times = sorted(elapsed for start, elapsed in values)
+        if not times:
+            continue
+        result[name] = {
+            "count": len(times),
+            "mean": sum(times) / len(times) * 1000,
+            "p95": times[min(len(times) - 1, int(len(times) * 0.95))] * 1000,
+            "max": times[-1] * 1000,
+            "total": sum(times) * 1000
+        }
+    return result
+
+def overlayText():
+    """
+    Returns a short multiline text of the recent timings for the live overlay.
+    """
+    lines = []
+    now = time.perf_counter()
+    frames = [elapsed for start, elapsed in samples["frame"] if now - start < 1.0]
+    lines.append("fps {}, cpu {:.1f}%".format(len(frames), cpuUsage() * 100))
+    for name in ("frame", "idle", "latency", "input", "draw", "clickCell", "arm"):
+        recent = [elapsed for start, elapsed in samples[name] if now - start < 1.0]
+        if recent:
+            lines.append("{} {:.2f} ms, max {:.2f} ms".format(
+                name, sum(recent) / len(recent) * 1000, max(recent) * 1000))
+    return "\n".join(lines)
+
+def dump(filename):
+    """
+    Writes the samples into a file. A .csv file gets every sample as a row of
+    name, start and milliseconds, any other file gets the summary as JSON.
+    """
+    if filename.endswith(".csv"):
+        with open(filename, "w", newline = "") as target:
+            writer = csv.writer(target)
+            writer.writerow(["name", "start", "ms"])
+            for name, values in samples.items():
+                for start, elapsed in values:
+                    writer.writerow([name, "{:.6f}".format(start), "{:.4f}".format(elapsed * 1000)])
+    else:
+        with open(filename, "w") as target:
+            json.dump(summary(), target, indent = 4)
@@ -0,0 +1,153 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the aggregate tables of the stats database and the
+functions that keep them up to date and query them.
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boardTotals (
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    bestTime REAL,
+    time REAL NOT NULL,
+    moves INTEGER NOT NULL,
+    winBbbv INTEGER NOT NULL,
+    winTime REAL NOT NULL,
+    PRIMARY KEY (width, height, mines)
+);
+CREATE TABLE IF NOT EXISTS playerTotals (
+    name TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    time REAL NOT NULL,
+    moves INTEGER NOT NULL,
+    winBbbv INTEGER NOT NULL,
+    winTime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS gamesByBestTime ON games (width, height, mines, win, time);
+"""
+
+BOARD_COLUMNS = ["width", "height", "mines", "games", "wins", "bestTime", "movesPerSecond",
+    "bbbvPerSecond"]
+PLAYER_COLUMNS = ["name", "games", "wins", "winRate", "movesPerSecond", "bbbvPerSecond"]
+#The 3BV and time summed over the won games whose 3BV is known.
+WIN_BBBV = "SUM(CASE WHEN win AND bbbv IS NOT NULL THEN bbbv ELSE 0 END)"
+WIN_TIME = "SUM(CASE WHEN win AND bbbv IS NOT NULL THEN time ELSE 0 END)"
+
+def create(connection):
+    """
+    Creates the aggregate tables if they don't exist yet. Tables written before
+    the 3BV totals existed are dropped and created again. Returns True if they
+    were, in which case the aggregates must be rebuilt.
+    """
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(boardTotals)")]
+    isOutdated = bool(columns) and "winBbbv" not in columns
+    if isOutdated:
+        with connection:
+            connection.execute("DROP TABLE boardTotals")
+            connection.execute("DROP TABLE playerTotals")
+    connection.executescript(SCHEMA)
+    return isOutdated
+
+def record(connection, name, isWin, time, numMoves, width, height, numMines, bbbv = None):
+    """
+    Adds one game to the aggregates. Meant to be called in the same transaction
+    that stores the game, so the aggregates never fall behind.
+    Params:
+        connection: An open connection to the stats database.
+        name: Name of the player.
+        isWin: Did the player win the game or not.
+        time: The time it took to play the game in seconds.
+        numMoves: The number of moves played during the game.
+        width: The width of the minefield in cells.
+        height: The height of the minefield in cells.
+        numMines: The number of active mines in the minefield.
+        bbbv: The 3BV of the minefield, or None if it is not known.
+    """
+    win = int(bool(isWin))
+    bestTime = time if win else None
+    winBbbv = 0
+    winTime = 0
+    if win and bbbv is not None:
+        winBbbv = bbbv
+        winTime = time
+    connection.execute(
+        "INSERT INTO boardTotals (width, height, mines, games, wins, bestTime, time, moves, "
+        "winBbbv, winTime) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (width, height, mines) DO UPDATE SET "
+        "games = games + 1, wins = wins + excluded.wins, "
+        "bestTime = CASE WHEN bestTime IS NULL THEN excluded.bestTime "
+        "ELSE MIN(bestTime, COALESCE(excluded.bestTime, bestTime)) END, "
+        "time = time + excluded.time, moves = moves + excluded.moves, "
+        "winBbbv = winBbbv + excluded.winBbbv, winTime = winTime + excluded.winTime",
+        (width, height, numMines, win, bestTime, time, numMoves, winBbbv, winTime))
+    connection.execute(
+        "INSERT INTO playerTotals (name, games, wins, time, moves, winBbbv, winTime) "
+        "VALUES (?, 1, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (name) DO UPDATE SET "
+        "games = games + 1, wins = wins + excluded.wins, "
+        "time = time + excluded.time, moves = moves + excluded.moves, "
+        "winBbbv = winBbbv + excluded.winBbbv, winTime = winTime + excluded.winTime",
+        (name, win, time, numMoves, winBbbv, winTime))
+
+def rebuild(connection):
+    """
+    Recomputes the aggregates from every stored game except the endless ones.
+    Only needed when games were stored without going through record, like in an import.
+    """
+    connection.execute("DELETE FROM boardTotals")
+    connection.execute("DELETE FROM playerTotals")
+    connection.execute(
+        "INSERT INTO boardTotals (width, height, mines, games, wins, bestTime, time, moves, "
+        "winBbbv, winTime) "
+        "SELECT width, height, mines, COUNT(*), SUM(win), MIN(CASE WHEN win THEN time END), "
+        "SUM(time), SUM(moves), " + WIN_BBBV + ", " + WIN_TIME + " "
+        "FROM games WHERE NOT endless GROUP BY width, height, mines")
+    connection.execute(
+        "INSERT INTO playerTotals (name, games, wins, time, moves, winBbbv, winTime) "
+        "SELECT name, COUNT(*), SUM(win), SUM(time), SUM(moves), " + WIN_BBBV + ", " + WIN_TIME + " "
+        "FROM games WHERE NOT endless GROUP BY name")
+
+def getBoards(connection):
+    """
+    Returns a row for every board size played, in the order of BOARD_COLUMNS,
+    most played first.
+    """
+    return connection.execute(
+        "SELECT width, height, mines, games, wins, bestTime, "
+        "CASE WHEN time > 0 THEN moves / time END, "
+        "CASE WHEN winTime > 0 THEN winBbbv / winTime END "
+        "FROM boardTotals ORDER BY games DESC").fetchall()
+
+def getPlayers(connection, limit = 100):
+    """
+    Returns a row for the most active players, in the order of PLAYER_COLUMNS.
+    Params:
+        limit: Maximum number of players to return.
+    """
+    return connection.execute(
+        "SELECT name, games, wins, CAST(wins AS REAL) / games, "
+        "CASE WHEN time > 0 THEN moves / time END, "
+        "CASE WHEN winTime > 0 THEN winBbbv / winTime END "
+        "FROM playerTotals ORDER BY games DESC, name LIMIT ?", (limit,)).fetchall()
+
+def getBestTimes(connection, width, height, numMines, limit = 10):
+    """
+    Returns the fastest wins on a board size as (name, time, moves, 3BV/s, date) rows.
+    Wins on endless boards are not counted.
+    The 3BV/s is None for games stored without a 3BV.
+    Served from an index, so the cost doesn't grow with the number of games.
+    Params:
+        width: The width of the minefield in cells.
+        height: The height of the minefield in cells.
+        numMines: The number of active mines in the minefield.
+        limit: Maximum number of rows to return.
+    """
+    return connection.execute(
+        "SELECT name, time, moves, CASE WHEN time > 0 THEN bbbv / time END, date FROM games "
+        "WHERE width = ? AND height = ? AND mines = ? AND win = 1 AND NOT endless "
+        "ORDER BY time LIMIT ?", (width, height, numMines, limit)).fetchall()
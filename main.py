@@ -3,16 +3,122 @@ Minesweeper by Jere Koivisto 2020
 
 This module contains the main function.
 """
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
 import application
+import instrument
 import menu
 
+#Modules of the game stack that the menu has not imported yet and that don't use
+#pyglet. Pyglet loads its windowing and GL modules when they are first used, which
+#has to happen on the main thread, so the modules using it are not prewarmed.
+PREWARM_MODULES = ["cell", "metrics", "submit"]
+SLOWEST_SHOWN = 5
+
+def prewarm():
+    """
+    Imports the modules of the game stack that don't use pyglet in the background
+    while the menu is shown, so starting the first game has less to load.
+    """
+    for name in PREWARM_MODULES:
+        importlib.import_module(name)
+
+def importTimes(statement):
+    """
+    Runs a statement in a new interpreter with -X importtime and returns the
+    imported modules as (depth, module, self microseconds, cumulative microseconds)
+    tuples in the order python reports them, the modules a module imports before it.
+    Params:
+        statement: Python statement to run.
+    """
+    #Only needed for --startup, so a normal start doesn't import it.
+    import subprocess
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+        cwd = os.path.dirname(os.path.abspath(__file__)), stdout = subprocess.DEVNULL,
+        stderr = subprocess.PIPE, universal_newlines = True)
+    modules = []
+    for line in process.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3:
+            continue
+        selfTime = parts[0][len("import time:"):].strip()
+        if not selfTime.isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((depth, name.strip(), int(selfTime), int(parts[1])))
+    return modules
+
+def reportStartup():
+    """
+    Prints how long importing the menu and the game stack takes and what they
+    spend it on, then how long the menu takes to show up in this process.
+    """
+    modules = importTimes("import menu\nimport game")
+    for root in ("menu", "game"):
+        children = []
+        total = None
+        #A module is reported after the modules it imports, which have a greater depth.
+        for depth, name, selfTime, cumulative in modules:
+            if depth == 0 and name == root:
+                total = cumulative
+                break
+            if depth == 0:
+                children = []
+            elif depth == 1:
+                children.append((cumulative, name))
+        if total is None:
+            print("Importing {} failed".format(root))
+            continue
+        print("Importing {}: {:.1f} ms".format(root, total / 1000))
+        for cumulative, name in sorted(children, reverse = True)[:SLOWEST_SHOWN]:
+            print("    {:<20} {:.1f} ms".format(name, cumulative / 1000))
+
+    start = time.perf_counter()
+    layer = menu.Menu()
+    layer.root.update()
+    print("Menu shown in {:.1f} ms".format((time.perf_counter() - start) * 1000))
+    layer.end()
+
 def main():
     """
-    The main function of the program.
+    The main function of the program. Timing instrumentation and profiling
+    are enabled from the command line.
     """
+    parser = argparse.ArgumentParser(description = "Minesweeper by Jere Koivisto")
+    parser.add_argument("--timings", metavar = "FILE",
+        help = "show a timing overlay and write the timings into a .json or .csv file on exit")
+    parser.add_argument("--profile", metavar = "FILE",
+        help = "run under cProfile and write the stats into a file on exit")
+    parser.add_argument("--prewarm", action = "store_true",
+        help = "import the game stack in the background while the menu is shown")
+    parser.add_argument("--startup", action = "store_true",
+        help = "report the import and startup times and quit")
+    args = parser.parse_args()
+
+    if args.startup:
+        reportStartup()
+        return
+
+    if args.timings:
+        instrument.enable()
+
     app = application.Application()
     app.initializeLayer(menu.Menu())
-    app.run()
+    if args.prewarm:
+        threading.Thread(target = prewarm, daemon = True).start()
+    if args.profile:
+        import cProfile
+        cProfile.runctx("app.run()", globals(), {"app": app}, args.profile)
+    else:
+        app.run()
+
+    if args.timings:
+        instrument.dump(args.timings)
 
 if __name__ == "__main__":
     main()
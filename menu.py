@@ -1,69 +1,75 @@
 """
 Minesweeper by Jere Koivisto 2020
 
-This module contains the game class and the readFile function.
+This module contains the menu class.
 """
 
+import os
 import tkinter as tk
-import game
+import gui
 import scores
-
-def readFile(filename):
-    """
-    A simple function for reading the contents of a text file into a string.
-    Params:
-        filename: Filename of the file to be read.
-    """
-    stats = []
-    try:
-        with open(filename) as source:
-            for row in source.readlines():
-                stats.append(row.strip().split(","))
-    except FileNotFoundError:
-        return False
-    else:
-        return stats
+import snapshot
+import stats
 
 class Menu:
     """
     One of the four Layer classes. Represents a menu where the player can choose
     to start a game, look at stats from earlier games and quit the program.
+    The game module and pyglet are only imported when a game is started, so the
+    menu shows up without loading the rendering stack.
     """
     def __init__(self):
         """
-        The constructor initializes necessary variables and creates the menus ui using tkinter.
+        The constructor initializes necessary variables and creates the menus ui
+        into a frame of the shared tkinter root.
         """
         self.next = None
 
-        self.root = tk.Tk()
-        self.root.title("Minesweeper by Jere Koivisto")
-        self.root.resizable(False, False)
+        self.root = gui.getRoot("Minesweeper by Jere Koivisto")
+        self.root.protocol("WM_DELETE_WINDOW", self.end)
+        self.frame = tk.Frame(self.root)
+        self.frame.pack()
 
-        self.wLabel = tk.Label(self.root, text = "Insert width")
+        self.wLabel = tk.Label(self.frame, text = "Insert width")
         self.wLabel.grid(row = 0, column = 0)
-        self.hLabel = tk.Label(self.root, text = "Insert height")
+        self.hLabel = tk.Label(self.frame, text = "Insert height")
         self.hLabel.grid(row = 0, column = 1)
-        self.mLabel = tk.Label(self.root, text = "Insert number of mines")
+        self.mLabel = tk.Label(self.frame, text = "Insert number of mines")
         self.mLabel.grid(row = 0, column = 2)
-        self.sLabel = tk.Label(self.root, text = "Insert graphics scale")
+        self.sLabel = tk.Label(self.frame, text = "Insert graphics scale")
         self.sLabel.grid(row = 0, column = 3)
+        self.seedLabel = tk.Label(self.frame, text = "Insert seed (optional)")
+        self.seedLabel.grid(row = 0, column = 4)
 
-        self.wEntry = tk.Entry(self.root)
+        self.wEntry = tk.Entry(self.frame)
         self.wEntry.grid(row = 1, column = 0)
-        self.hEntry = tk.Entry(self.root)
+        self.hEntry = tk.Entry(self.frame)
         self.hEntry.grid(row = 1, column = 1)
-        self.mEntry = tk.Entry(self.root)
+        self.mEntry = tk.Entry(self.frame)
         self.mEntry.grid(row = 1, column = 2)
-        self.sEntry = tk.Entry(self.root)
+        self.sEntry = tk.Entry(self.frame)
         self.sEntry.insert(tk.END, "1.0")
         self.sEntry.grid(row = 1, column = 3)
+        self.seedEntry = tk.Entry(self.frame)
+        self.seedEntry.grid(row = 1, column = 4)
 
-        self.startButton = tk.Button(self.root, text = "Start", command = self.start)
+        self.noGuess = tk.BooleanVar(self.root, False)
+        self.noGuessButton = tk.Checkbutton(self.frame, text = "No guessing", variable = self.noGuess)
+        self.noGuessButton.grid(row = 3, column = 2)
+        self.endless = tk.BooleanVar(self.root, False)
+        self.endlessButton = tk.Checkbutton(self.frame, text = "Endless", variable = self.endless)
+        self.endlessButton.grid(row = 4, column = 2)
+
+        self.startButton = tk.Button(self.frame, text = "Start", command = self.start)
         self.startButton.grid(row = 3, column = 0)
-        self.endButton = tk.Button(self.root, text = "End", command = self.end)
-        self.endButton.grid(row = 3, column = 3)
-        self.scoresButton = tk.Button(self.root, text = "Statistics", command = self.scores)
+        self.endButton = tk.Button(self.frame, text = "End", command = self.end)
+        self.endButton.grid(row = 3, column = 4)
+        self.scoresButton = tk.Button(self.frame, text = "Statistics", command = self.scores)
         self.scoresButton.grid(row = 3, column = 1)
+        self.resumeButton = tk.Button(self.frame, text = "Resume", command = self.resume)
+        self.resumeButton.grid(row = 3, column = 3)
+        if not os.path.exists(snapshot.SAVE_FILE):
+            self.resumeButton.configure(state = tk.DISABLED)
 
     def update(self):
         """
@@ -85,21 +91,49 @@ class Menu:
             height = int(float(self.hEntry.get()))
             mines = int(float(self.mEntry.get()))
             scale = float(self.sEntry.get())
+            seed = None
+            if self.seedEntry.get().strip():
+                seed = int(self.seedEntry.get())
+                if seed < 0:
+                    raise ValueError
             if width <= 0 or height <= 0 or mines <= 0 or scale <= 0:
                 raise ValueError
         except ValueError:
-            errorLabel = tk.Label(self.root, text = "Input value must be a positive number!")
+            errorLabel = tk.Label(self.frame, text = "Input value must be a positive number!")
             errorLabel.grid(row = 2, column = 0)
         else:
-            self.root.destroy()
-            self.next = game.Game(width, height, mines, scale)
+            import game
+            gui.leave(self.frame)
+            self.next = game.Game(width, height, mines, scale, seed, self.noGuess.get(),
+                isEndless = self.endless.get())
+
+    def resume(self):
+        """
+        Resumes the game saved when a game window was last closed mid-game.
+        Uses the graphics scale of the entry field.
+        Meant to be called by the resume button.
+        """
+        try:
+            scale = float(self.sEntry.get())
+            if scale <= 0:
+                raise ValueError
+            savedGame = snapshot.Snapshot()
+        except (OSError, ValueError):
+            errorLabel = tk.Label(self.frame, text = "Could not resume the saved game!")
+            errorLabel.grid(row = 2, column = 3)
+        else:
+            import game
+            gui.leave(self.frame)
+            self.next = game.Game(savedGame.width, savedGame.height, savedGame.numMines, scale,
+                savedGame.seed, savedGame.noGuess, savedGame = savedGame)
 
     def end(self):
         """
         Closes the program. Changes the current layer into nothing effectively closing
-        the program. Meant to be called by the quit button.
+        the program. Meant to be called by the quit button and when the window is closed.
         """
-        self.root.destroy()
+        gui.leave(self.frame)
+        gui.close()
         self.next = None
 
     def scores(self):
@@ -108,10 +142,11 @@ class Menu:
         Changes the current layer into a Score layer.
         Meant to be called by the scores button.
         """
-        source = readFile("stats.txt")
-        if source:
-            self.root.destroy()
-            self.next = scores.Scores(source)
+        store = stats.Stats()
+        if store.countGames():
+            gui.leave(self.frame)
+            self.next = scores.Scores(store)
         else:
-            errorLabel = tk.Label(self.root, text = "No stats detected yet!")
+            store.close()
+            errorLabel = tk.Label(self.frame, text = "No stats detected yet!")
             errorLabel.grid(row = 2, column = 1)
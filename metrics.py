@@ -0,0 +1,119 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the board difficulty metrics and the batch runner that
+measures them over many generated boards.
+
+The 3BV of a board is the least number of clicks that clears it: one for every
+opening, a connected area of empty cells that opens with its numbered border
+in one click, and one for every numbered cell no opening reaches, an island.
+
+Usage: python metrics.py [-n BOARDS] [-W WIDTH] [-H HEIGHT] [-m MINES] [--no-guess]
+"""
+import argparse
+import time
+import board
+
+#Keeps the mines and the neighbour counts of a cell state, so every cell reads as hidden.
+LAYOUT_MASK = bytes(b & (board.MINE | board.NEIGHBOURS) for b in range(256))
+
+def analyse(boardRef):
+    """
+    Returns the difficulty metrics of an armed board as a dictionary of the 3BV,
+    the number of openings, the cells they reveal, the largest of them and the
+    number of islands. The cells are labelled with the scanline flood of the
+    board on a copy of its mines, starting from every empty cell no earlier
+    opening reached, so the work is linear in the size of the board.
+    Params:
+        boardRef: A reference to an armed board. Played cells are ignored.
+    """
+    state = boardRef.state
+    if not isinstance(state, bytearray):
+        #A resumed game maps its state from the snapshot file.
+        state = bytearray(state[:])
+    work = board.Board(boardRef.width, boardRef.height, 0, 0)
+    work.state = state = state.translate(LAYOUT_MASK)
+
+    openings = 0
+    largest = 0
+    #A hidden empty cell without a mine or a flag is the only state that is zero.
+    pos = state.find(0)
+    while pos != -1:
+        opened = work.visibleCellCounter
+        work.flood([pos])
+        openings += 1
+        largest = max(largest, work.visibleCellCounter - opened)
+        pos = state.find(0, pos + 1)
+
+    islands = boardRef.size - boardRef.numMines - work.visibleCellCounter
+    return {
+        "bbbv": openings + islands,
+        "openings": openings,
+        "openingCells": work.visibleCellCounter,
+        "largestOpening": largest,
+        "islands": islands
+    }
+
+def measureBoard(args):
+    """
+    Generates a board armed from its center and returns its metrics.
+    Params:
+        args: A tuple of (width, height, numMines, seed, noGuess).
+    """
+    width, height, numMines, seed, noGuess = args
+    b = board.Board(width, height, numMines, seed, noGuess)
+    b.arm(b.index(width // 2, height // 2))
+    return analyse(b)
+
+def run(boards, width, height, numMines, noGuess = False, seed = 0, processes = None):
+    """
+    Measures a batch of generated boards across a process pool and returns a
+    dictionary of the mean, lowest and highest value of every metric.
+    Params:
+        boards: Number of boards to be generated.
+        width: Width of the boards in cells.
+        height: Height of the boards in cells.
+        numMines: Number of mines on each board.
+        noGuess: Generate boards that can be cleared without guessing.
+        seed: Seed of the first board. The following boards count up from it.
+        processes: Size of the process pool. Uses every core if None.
+    """
+    #Only needed here, so a game analysing its board doesn't import multiprocessing.
+    import multiprocessing
+    jobs = [(width, height, numMines, seed + i, noGuess) for i in range(boards)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(measureBoard, jobs, chunksize = max(1, boards // 64))
+    elapsed = time.perf_counter() - start
+
+    summary = {"boards": boards, "boardsPerSecond": boards / elapsed}
+    for name in results[0]:
+        values = [result[name] for result in results]
+        summary[name] = {"mean": sum(values) / boards, "min": min(values), "max": max(values)}
+    return summary
+
+def main():
+    """
+    Parses the command line, measures the boards and prints the summary.
+    """
+    parser = argparse.ArgumentParser(description = "Measures the difficulty of generated boards.")
+    parser.add_argument("-n", "--boards", type = int, default = 10000)
+    parser.add_argument("-W", "--width", type = int, default = 30)
+    parser.add_argument("-H", "--height", type = int, default = 16)
+    parser.add_argument("-m", "--mines", type = int, default = 99)
+    parser.add_argument("--no-guess", action = "store_true")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("-p", "--processes", type = int, default = None)
+    args = parser.parse_args()
+
+    summary = run(args.boards, args.width, args.height, args.mines, args.no_guess, args.seed,
+        args.processes)
+    print("{} boards of {}x{} with {} mines, {:.0f} boards/s".format(summary["boards"],
+        args.width, args.height, args.mines, summary["boardsPerSecond"]))
+    for name, value in summary.items():
+        if isinstance(value, dict):
+            print("{:>15}: mean {:.2f}, min {}, max {}".format(name, value["mean"], value["min"],
+                value["max"]))
+
+if __name__ == "__main__":
+    main()
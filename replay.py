@@ -0,0 +1,210 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the replay format, the recorder class and the replay functions.
+
+A replay starts with MAGIC and a header of varints: width, height, number of
+mines, seed and flags. The header is followed by one pair of varints per move:
+the milliseconds since the previous move, and the flat index of the cell shifted
+left by two with the action in the lower two bits. Moves are only ever appended,
+so a replay can be written and read as a stream.
+
+Usage: python replay.py [DATABASE]
+Verifies every replay stored in the stats database and reports the speed.
+"""
+import sys
+import time
+import session
+import stats
+
+MAGIC = b"MSR\x01"
+NO_GUESS = 0x01
+ENDLESS = 0x02
+
+REVEAL = 0
+FLAG = 1
+CHORD = 2
+
+def writeVarint(out, value):
+    """
+    Appends a non-negative integer to a bytearray, seven bits per byte.
+    """
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def readVarint(data, pos):
+    """
+    Reads an integer written by writeVarint. Returns the integer and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def readHeader(data):
+    """
+    Returns (width, height, numMines, seed, noGuess, isEndless, pos) from the
+    start of a replay, where pos is the position of the first move.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a replay")
+    pos = len(MAGIC)
+    header = []
+    for i in range(5):
+        value, pos = readVarint(data, pos)
+        header.append(value)
+    width, height, numMines, seed, flags = header
+    return width, height, numMines, seed, bool(flags & NO_GUESS), bool(flags & ENDLESS), pos
+
+def readMoves(data, pos):
+    """
+    Yields every move of a replay as a (time, index, action) tuple, where time is
+    in seconds from the start of the game.
+    Params:
+        data: The replay.
+        pos: Position of the first move, as returned by readHeader.
+    """
+    #Both varints are read inline, this loop is most of the cost of verifying a replay.
+    millis = 0
+    end = len(data)
+    while pos < end:
+        byte = data[pos]
+        pos += 1
+        delta = byte & 0x7F
+        shift = 7
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+        byte = data[pos]
+        pos += 1
+        move = byte & 0x7F
+        shift = 7
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            move |= (byte & 0x7F) << shift
+            shift += 7
+        millis += delta
+        yield millis / 1000, move >> 2, move & 3
+
+def apply(game, index, action):
+    """
+    Plays one move on a session and returns the changed spans.
+    Params:
+        game: The session.
+        index: Flat index of the cell.
+        action: REVEAL, FLAG or CHORD.
+    """
+    x, y = game.board.coords(index)
+    if action == FLAG:
+        return game.flag(x, y)
+    if action == CHORD:
+        return game.chord(x, y)
+    return game.reveal(x, y)
+
+def play(data):
+    """
+    Replays a game headlessly as fast as possible and returns the finished session.
+    """
+    width, height, numMines, seed, noGuess, isEndless, pos = readHeader(data)
+    game = session.Session(width, height, numMines, seed, noGuess, isEndless)
+    moves = (game.reveal, game.flag, game.chord)
+    for moveTime, index, action in readMoves(data, pos):
+        y, x = divmod(index, game.width)
+        moves[action](x, y)
+    return game
+
+def verify(data, isWin, numMoves):
+    """
+    Checks that a replay ends the way the game was recorded to end.
+    Params:
+        data: The replay.
+        isWin: Was the game won.
+        numMoves: The number of moves played during the game.
+    """
+    try:
+        game = play(data)
+    except (ValueError, IndexError):
+        return False
+    return game.hasEnded and game.hasFailed != bool(isWin) and game.moveCounter == numMoves
+
+class Recorder:
+    """
+    A class that records the moves of a game into a replay as they are played.
+    """
+    def __init__(self, width, height, numMines, seed, noGuess = False, isEndless = False):
+        """
+        The constructor writes the header. The game clock starts from the moment
+        the recorder is created.
+        Params:
+            width: Width of the board in cells.
+            height: Height of the board in cells.
+            numMines: Number of mines on the board.
+            seed: Seed of the mine placement.
+            noGuess: Was the board generated without guessing.
+            isEndless: Was the game played on an endless board.
+        """
+        flags = (NO_GUESS if noGuess else 0) | (ENDLESS if isEndless else 0)
+        self.data = bytearray(MAGIC)
+        for value in (width, height, numMines, seed, flags):
+            writeVarint(self.data, value)
+        self.startTime = time.perf_counter()
+        self.millis = 0
+
+    def record(self, timestamp, index, action):
+        """
+        Appends a move.
+        Params:
+            timestamp: The time.perf_counter value of when the move was made.
+            index: Flat index of the cell.
+            action: REVEAL, FLAG or CHORD.
+        """
+        millis = max(int(round((timestamp - self.startTime) * 1000)), self.millis)
+        writeVarint(self.data, millis - self.millis)
+        writeVarint(self.data, index << 2 | action)
+        self.millis = millis
+
+    def getBytes(self):
+        """
+        Returns the replay recorded so far.
+        """
+        return bytes(self.data)
+
+def verifyGame(args):
+    """
+    Calls verify with a tuple of (data, isWin, numMoves), for the process pool.
+    """
+    return verify(*args)
+
+def main():
+    """
+    Verifies every stored replay across a process pool and prints how many
+    passed and how fast.
+    """
+    filename = sys.argv[1] if len(sys.argv) > 1 else stats.DATABASE
+    store = stats.Stats(filename, None)
+    games = store.getReplays()
+    store.close()
+
+    start = time.perf_counter()
+    #Only needed here, so loading a replay doesn't import multiprocessing.
+    import multiprocessing
+    with multiprocessing.Pool() as pool:
+        passed = sum(pool.map(verifyGame, games, chunksize = max(1, len(games) // 64)))
+    elapsed = time.perf_counter() - start
+
+    print("{} of {} replays verified".format(passed, len(games)))
+    if games:
+        print("{:.0f} replays/s".format(len(games) / elapsed))
+
+if __name__ == "__main__":
+    main()
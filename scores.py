@@ -5,42 +5,248 @@ This module contains the scores class.
 """
 
 import tkinter as tk
+from tkinter import ttk
 import menu
+import gui
+import replay
+import stats
+import leaderboard
+
+PAGE_SIZE = 50
+BEST_TIMES = 10
+
+HEADINGS = ["Date", "Name", "Win", "Time", "Moves", "Width", "Height", "Mines", "3BV", "Endless"]
+#Computed for the shown rows only, so the games can't be sorted by them.
+EXTRA_COLUMNS = ["bbbvPerSecond"]
+EXTRA_HEADINGS = ["3BV/s"]
+BOARD_HEADINGS = ["Width", "Height", "Mines", "Games", "Wins", "Best time", "Moves/s", "3BV/s"]
+PLAYER_HEADINGS = ["Name", "Games", "Wins", "Win rate", "Moves/s", "3BV/s"]
+BEST_TIME_COLUMNS = ["name", "time", "moves", "bbbvPerSecond", "date"]
+BEST_TIME_HEADINGS = ["Name", "Time", "Moves", "3BV/s", "Date"]
+
+def createTable(parent, columns, headings, height):
+    """
+    Creates a table with a heading for every column.
+    Params:
+        parent: The widget the table is placed in.
+        columns: Names of the columns.
+        headings: Texts shown above the columns.
+        height: Number of rows shown at once.
+    """
+    table = ttk.Treeview(parent, columns = columns, show = "headings", height = height)
+    for column, heading in zip(columns, headings):
+        table.heading(column, text = heading)
+        table.column(column, width = 80, anchor = tk.CENTER)
+    return table
+
+def formatRate(rate):
+    """
+    Formats a rate with two decimals, or a dash if there is none.
+    """
+    if rate is None:
+        return "-"
+    return "{:.2f}".format(rate)
 
 class Scores:
     """
     A class that represents a stats screen. One of the four layer classes.
+    Shows one page of games at a time in a table. Sorting, filtering and
+    paging are done by the stats database, only the visible rows are loaded.
+    The board and player tabs show totals that the database keeps up to date,
+    so they open just as fast no matter how many games have been played.
     """
-    def __init__(self, source):
+    def __init__(self, store):
         """
-        The constructor creates and fills the grid with statistics.
+        The constructor creates the tables and shows the first page of statistics.
         Params:
-            source: The statistics in a list in list two dimentional matrix.
+            store: A reference to an open Stats instance.
         """
         self.next = None
 
-        self.root = tk.Tk()
-        self.root.title("Game stats")
-        self.root.resizable(False, False)
+        self.root = gui.getRoot("Game stats")
+        self.root.protocol("WM_DELETE_WINDOW", lambda: gui.leave(self.frame))
+        self.frame = tk.Frame(self.root)
+        self.frame.pack()
+
+        self.stats = store
+        self.page = 0
+        self.orderBy = "date"
+        self.descending = True
+        self.nameFilter = ""
+        self.replayData = None
+
+        self.tabs = ttk.Notebook(self.frame)
+        self.tabs.pack()
+        gamesTab = tk.Frame(self.tabs)
+        boardsTab = tk.Frame(self.tabs)
+        playersTab = tk.Frame(self.tabs)
+        self.tabs.add(gamesTab, text = "Games")
+        self.tabs.add(boardsTab, text = "Boards")
+        self.tabs.add(playersTab, text = "Players")
+
+        tk.Label(gamesTab, text = "Filter by name").grid(row = 0, column = 0)
+        self.filterEntry = tk.Entry(gamesTab)
+        self.filterEntry.grid(row = 0, column = 1)
+        self.filterEntry.bind("<Return>", lambda event: self.applyFilter())
+        self.filterButton = tk.Button(gamesTab, text = "Filter", command = self.applyFilter)
+        self.filterButton.grid(row = 0, column = 2)
+
+        self.table = createTable(gamesTab, stats.COLUMNS + EXTRA_COLUMNS,
+            HEADINGS + EXTRA_HEADINGS, PAGE_SIZE // 2)
+        for column in stats.COLUMNS:
+            self.table.heading(column, command = lambda column = column: self.sort(column))
+        self.table.column("date", width = 180)
+        self.table.column("name", width = 120)
+        self.table.grid(row = 1, column = 0, columnspan = 5)
 
-        self.stats = source
+        self.previousButton = tk.Button(gamesTab, text = "Previous", command = self.previousPage)
+        self.previousButton.grid(row = 2, column = 0)
+        self.pageLabel = tk.Label(gamesTab)
+        self.pageLabel.grid(row = 2, column = 1, columnspan = 3)
+        self.nextButton = tk.Button(gamesTab, text = "Next", command = self.nextPage)
+        self.nextButton.grid(row = 2, column = 4)
+        self.replayButton = tk.Button(gamesTab, text = "Watch replay", command = self.watchReplay)
+        self.replayButton.grid(row = 3, column = 0, columnspan = 5)
 
-        tk.Label(self.root, text = "Date").grid(row = 0, column = 0)
-        tk.Label(self.root, text = "Name").grid(row = 0, column = 1)
-        tk.Label(self.root, text = "Win").grid(row = 0, column = 2)
-        tk.Label(self.root, text = "Time").grid(row = 0, column = 3)
-        tk.Label(self.root, text = "Moves").grid(row = 0, column = 4)
-        tk.Label(self.root, text = "Width").grid(row = 0, column = 5)
-        tk.Label(self.root, text = "Height").grid(row = 0, column = 6)
-        tk.Label(self.root, text = "Mines").grid(row = 0, column = 7)
+        self.boardTable = createTable(boardsTab, leaderboard.BOARD_COLUMNS, BOARD_HEADINGS,
+            PAGE_SIZE // 4)
+        self.boardTable.grid(row = 0, column = 0)
+        self.boardTable.bind("<<TreeviewSelect>>", lambda event: self.showBestTimes())
+        tk.Label(boardsTab, text = "Best times of the selected board").grid(row = 1, column = 0)
+        self.bestTable = createTable(boardsTab, BEST_TIME_COLUMNS, BEST_TIME_HEADINGS, BEST_TIMES)
+        self.bestTable.column("date", width = 180)
+        self.bestTable.grid(row = 2, column = 0)
 
-        for i, row in enumerate(reversed(self.stats)):
-            for j, element in enumerate(row):
-                tk.Label(self.root, text = str(element)).grid(row = i + 1, column = j)
+        self.playerTable = createTable(playersTab, leaderboard.PLAYER_COLUMNS, PLAYER_HEADINGS,
+            PAGE_SIZE // 2)
+        self.playerTable.column("name", width = 120)
+        self.playerTable.grid(row = 0, column = 0)
+
+        self.showBoards()
+        self.showPlayers()
+        self.showPage()
 
     def update(self):
         """
-        Serves as a way to change the layer back to a menu.
+        Serves as a way to change the layer back to a menu, or to a game playing
+        back the chosen replay.
         """
         self.root.mainloop()
+        self.stats.close()
+        if self.replayData:
+            import game
+            width, height, numMines, seed, noGuess, isEndless, pos = replay.readHeader(self.replayData)
+            return game.Game(width, height, numMines, 1.0, seed, noGuess, self.replayData,
+                isEndless = isEndless)
         return menu.Menu()
+
+    def countPages(self):
+        """
+        Returns the number of pages matching the current filter.
+        """
+        return max(1, (self.stats.countGames(self.nameFilter) + PAGE_SIZE - 1) // PAGE_SIZE)
+
+    def showPage(self):
+        """
+        Replaces the rows of the table with the current page.
+        """
+        pages = self.countPages()
+        self.page = min(self.page, pages - 1)
+
+        self.table.delete(*self.table.get_children())
+        rows = self.stats.getGames(self.page * PAGE_SIZE, PAGE_SIZE,
+            self.orderBy, self.descending, self.nameFilter)
+        for gameId, date, name, win, time, moves, width, height, mines, bbbv, endless in rows:
+            #3BV/s only measures a cleared board.
+            rate = None
+            if win and bbbv is not None and time > 0:
+                rate = bbbv / time
+            self.table.insert("", tk.END, iid = gameId, values = (date, name, bool(win),
+                stats.formatTime(time), moves, width, height, mines,
+                "-" if bbbv is None else bbbv, bool(endless), formatRate(rate)))
+
+        self.pageLabel.configure(text = "Page {} of {}".format(self.page + 1, pages))
+
+    def showBoards(self):
+        """
+        Fills the board table from the cached totals. The rows are identified by
+        their board size so the best times can be looked up when one is selected.
+        """
+        for (width, height, mines, games, wins, bestTime, movesPerSecond,
+                bbbvPerSecond) in self.stats.getBoards():
+            if bestTime is None:
+                bestTime = "-"
+            else:
+                bestTime = stats.formatTime(bestTime)
+            self.boardTable.insert("", tk.END, iid = "{},{},{}".format(width, height, mines),
+                values = (width, height, mines, games, wins, bestTime, formatRate(movesPerSecond),
+                formatRate(bbbvPerSecond)))
+
+    def showBestTimes(self):
+        """
+        Shows the fastest wins on the board size selected in the board table.
+        """
+        self.bestTable.delete(*self.bestTable.get_children())
+        selection = self.boardTable.selection()
+        if not selection:
+            return
+        width, height, mines = [int(value) for value in selection[0].split(",")]
+        for name, time, moves, bbbvPerSecond, date in self.stats.getBestTimes(width, height, mines,
+                BEST_TIMES):
+            self.bestTable.insert("", tk.END, values = (name, stats.formatTime(time), moves,
+                formatRate(bbbvPerSecond), date))
+
+    def showPlayers(self):
+        """
+        Fills the player table from the cached totals.
+        """
+        for name, games, wins, winRate, movesPerSecond, bbbvPerSecond in self.stats.getPlayers():
+            self.playerTable.insert("", tk.END, values = (name, games, wins,
+                "{:.0%}".format(winRate), formatRate(movesPerSecond), formatRate(bbbvPerSecond)))
+
+    def watchReplay(self):
+        """
+        Closes the stats screen and plays back the replay of the selected game.
+        Older games have no replay and are skipped.
+        """
+        selection = self.table.selection()
+        if selection:
+            self.replayData = self.stats.getReplay(int(selection[0]))
+            if self.replayData:
+                gui.leave(self.frame)
+
+    def sort(self, column):
+        """
+        Sorts by a column. Clicking the same column again reverses the order.
+        """
+        if self.orderBy == column:
+            self.descending = not self.descending
+        else:
+            self.orderBy = column
+            self.descending = True
+        self.page = 0
+        self.showPage()
+
+    def applyFilter(self):
+        """
+        Only shows games of players whose name contains the text of the filter entry.
+        """
+        self.nameFilter = self.filterEntry.get()
+        self.page = 0
+        self.showPage()
+
+    def previousPage(self):
+        """
+        Shows the previous page.
+        """
+        if self.page > 0:
+            self.page -= 1
+            self.showPage()
+
+    def nextPage(self):
+        """
+        Shows the next page.
+        """
+        if self.page < self.countPages() - 1:
+            self.page += 1
+            self.showPage()
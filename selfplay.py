@@ -0,0 +1,121 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the batch self-play runner. Plays games headlessly with
+the solver across a process pool and reports the results.
+
+Usage: python selfplay.py [-n GAMES] [-W WIDTH] [-H HEIGHT] [-m MINES] [--no-guess] [--check]
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+import board
+import session
+import solver
+
+def playGame(args):
+    """
+    Plays one game from the center of the board with the solver. Guesses the
+    cell least likely to be a mine when nothing can be deduced. Returns a tuple
+    of (isWin, moves, total move time, worst move time, wrong deductions).
+    Params:
+        args: A tuple of (width, height, numMines, seed, noGuess, check). If check
+            is set, every deduction is compared with the real board.
+    """
+    width, height, numMines, seed, noGuess, check = args
+    game = session.Session(width, height, numMines, seed, noGuess)
+    bot = solver.Solver(game.board)
+    b = game.board
+
+    moves = 0
+    total = 0.0
+    worst = 0.0
+    wrong = 0
+    pending = [b.index(width // 2, height // 2)]
+    while not game.hasEnded:
+        start = time.perf_counter()
+        if not pending:
+            pending = list(bot.deduce())
+            if check:
+                wrong += sum(1 for i in pending if b.state[i] & board.MINE)
+                wrong += sum(1 for i in bot.mines if not b.state[i] & board.MINE)
+            if not pending:
+                pending = [bot.guess()[0]]
+        index = pending.pop()
+        if b.isVisible(index):
+            continue
+        x, y = b.coords(index)
+        bot.update(game.reveal(x, y))
+        elapsed = time.perf_counter() - start
+
+        moves += 1
+        total += elapsed
+        worst = max(worst, elapsed)
+
+    return not game.hasFailed, moves, total, worst, wrong
+
+def run(games, width, height, numMines, noGuess = False, seed = 0, processes = None,
+        check = False):
+    """
+    Plays a batch of games across a process pool and returns a dictionary of results.
+    Params:
+        games: Number of games to be played.
+        width: Width of the boards in cells.
+        height: Height of the boards in cells.
+        numMines: Number of mines on each board.
+        noGuess: Generate boards that can be cleared without guessing.
+        seed: Seed of the first game. The following games count up from it.
+        processes: Size of the process pool. Uses every core if None.
+        check: Compare every deduction of the solver with the real board.
+    """
+    jobs = [(width, height, numMines, seed + i, noGuess, check) for i in range(games)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(playGame, jobs, chunksize = max(1, games // 64))
+    elapsed = time.perf_counter() - start
+
+    wins = sum(1 for result in results if result[0])
+    moves = sum(result[1] for result in results)
+    moveTime = sum(result[2] for result in results)
+    return {
+        "games": games,
+        "wins": wins,
+        "winRate": wins / games,
+        "gamesPerSecond": games / elapsed,
+        "moves": moves,
+        "meanMoveLatency": moveTime / moves,
+        "worstMoveLatency": max(result[3] for result in results),
+        "wrongDeductions": sum(result[4] for result in results)
+    }
+
+def main():
+    """
+    Parses the command line, plays the games and prints the results.
+    """
+    parser = argparse.ArgumentParser(description = "Plays minesweeper games with the solver.")
+    parser.add_argument("-n", "--games", type = int, default = 1000)
+    parser.add_argument("-W", "--width", type = int, default = 30)
+    parser.add_argument("-H", "--height", type = int, default = 16)
+    parser.add_argument("-m", "--mines", type = int, default = 99)
+    parser.add_argument("-s", "--seed", type = int, default = 0)
+    parser.add_argument("-p", "--processes", type = int, default = None)
+    parser.add_argument("--no-guess", action = "store_true")
+    parser.add_argument("--check", action = "store_true",
+        help = "compare every deduction with the real board and exit with 1 if one is wrong")
+    args = parser.parse_args()
+
+    results = run(args.games, args.width, args.height, args.mines,
+        args.no_guess, args.seed, args.processes, args.check)
+    print("Games: {}".format(results["games"]))
+    print("Win rate: {:.1f}%".format(results["winRate"] * 100))
+    print("Games/s: {:.1f}".format(results["gamesPerSecond"]))
+    print("Move latency: {:.3f} ms mean, {:.3f} ms worst".format(
+        results["meanMoveLatency"] * 1000, results["worstMoveLatency"] * 1000))
+    if args.check:
+        print("Wrong deductions: {}".format(results["wrongDeductions"]))
+        if results["wrongDeductions"]:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the local game server for bots. It hosts any number of
+headless sessions in one process on an asyncio event loop. Bots talk to it in
+JSON lines, one request and one response per line, and every move answers
+with the changed cells only.
+
+Usage: python server.py [--host HOST] [--port PORT] [--unix PATH]
+       python server.py --load CLIENTS [--connect] [--games GAMES] [-W WIDTH] [-H HEIGHT]
+           [-m MINES]
+
+Requests, every one with an optional id that the response echoes:
+    {"cmd": "new", "width": 9, "height": 9, "mines": 10, "seed": 0, "noGuess": false}
+    {"cmd": "reveal", "session": 1, "x": 4, "y": 4}, and the same for "flag" and "chord"
+    {"cmd": "board", "session": 1}
+    {"cmd": "close", "session": 1}
+    {"cmd": "stats"}
+Moves and "board" answer {"spans": [[start, cells], ...], "status": {...}}. The cells
+are a string with a character per cell from the flat index start on: "#" hidden,
+"F" flagged, "0" to "8" revealed and "*" a revealed mine. Errors answer {"error": message}.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import board
+import session
+
+HOST = "127.0.0.1"
+PORT = 8765
+#Per session memory is one byte per cell, so the board size bounds it.
+MAX_CELLS = 1 << 20
+#Largest board generated without guessing. Its solver runs for up to a second.
+MAX_NO_GUESS_CELLS = 1 << 16
+MAX_SESSIONS = 100000
+#Cells of every session together, which bounds the memory of the whole server.
+MAX_TOTAL_CELLS = 1 << 28
+#Longest accepted request line in bytes.
+MAX_LINE = 4096
+#Longest response line a bot reads. A flood over the largest board can take a few bytes a cell.
+MAX_RESPONSE = 32 * MAX_CELLS
+REPORT_INTERVAL = 5.0
+
+#What a player may see of each cell state. Hidden mines look like any hidden cell.
+VIEW = bytes(
+    (ord("*") if b & board.MINE else ord("0") + (b & board.NEIGHBOURS)) if b & board.VISIBLE
+    else ord("F") if b & board.FLAG else ord("#")
+    for b in range(256))
+MOVES = {
+    "reveal": session.Session.reveal,
+    "flag": session.Session.flag,
+    "chord": session.Session.chord
+}
+
+def encode(message):
+    """
+    Returns a message as one line of compact JSON.
+    """
+    return (json.dumps(message, separators = (",", ":")) + "\n").encode()
+
+def encodeSpans(state, spans):
+    """
+    Returns spans of a state array as [start, cells] pairs for a response.
+    Params:
+        state: The state array of a board.
+        spans: (start, stop) spans of flat indices.
+    """
+    return [[start, state[start:stop].translate(VIEW).decode("ascii")] for start, stop in spans]
+
+class Server:
+    """
+    Hosts the sessions of every connection and counts the requests. Sessions
+    belong to the connection that created them and are dropped when it closes.
+    """
+    def __init__(self):
+        """
+        The constructor initializes the counters.
+        """
+        self.ids = itertools.count(1)
+        self.sessionCount = 0
+        self.cellCount = 0
+        self.requestCount = 0
+        self.startTime = time.perf_counter()
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection until it closes. Requests are answered in order,
+        and a client that stops reading is stopped by the write buffer filling up.
+        Params:
+            reader: The asyncio stream reader of the connection.
+            writer: The asyncio stream writer of the connection.
+        """
+        sessions = {}
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(encode({"error": "request longer than {} bytes".format(MAX_LINE)}))
+                    break
+                if not line:
+                    break
+                writer.write(await self.respond(line, sessions))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in sessions.values():
+                self.drop(game)
+            writer.close()
+
+    async def respond(self, line, sessions):
+        """
+        Returns the response line to a request line. Any request that cannot be
+        parsed or carried out is answered with an error and the connection is kept.
+        Params:
+            line: The request as a line of JSON.
+            sessions: The sessions of the connection by id.
+        """
+        self.requestCount += 1
+        requestId = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be an object")
+            requestId = request.get("id")
+            response = await self.dispatch(request, sessions)
+        except KeyError as error:
+            response = {"error": "missing field {}".format(error)}
+        except Exception as error:
+            #Also overflowing numbers such as 1e999 and lines nested too deep to decode.
+            response = {"error": str(error) or type(error).__name__}
+        response["id"] = requestId
+        return encode(response)
+
+    async def dispatch(self, request, sessions):
+        """
+        Carries out a request and returns the response as a dictionary.
+        Raises ValueError if the request is not valid. The first move on a board
+        without guessing runs the solver in a thread, so other connections are
+        still served meanwhile.
+        Params:
+            request: The decoded request.
+            sessions: The sessions of the connection by id.
+        """
+        command = request["cmd"]
+        if command == "new":
+            return self.newSession(request, sessions)
+        if command == "stats":
+            return self.stats()
+
+        sessionId = request["session"]
+        game = sessions.get(sessionId)
+        if game is None:
+            raise ValueError("unknown session")
+        if command in MOVES:
+            x = int(request["x"])
+            y = int(request["y"])
+            if not (0 <= x < game.width and 0 <= y < game.height):
+                raise ValueError("cell outside the board")
+            if game.board.noGuess and not game.board.isArmed:
+                spans = await asyncio.get_running_loop().run_in_executor(None, MOVES[command],
+                    game, x, y)
+            else:
+                spans = MOVES[command](game, x, y)
+            return {"spans": encodeSpans(game.board.state, spans), "status": game.status()}
+        if command == "board":
+            return {"spans": encodeSpans(game.board.state, [(0, game.board.size)]),
+                "status": game.status()}
+        if command == "close":
+            self.drop(sessions.pop(sessionId))
+            return {}
+        raise ValueError("unknown command")
+
+    def newSession(self, request, sessions):
+        """
+        Creates a session and returns its id and board.
+        Params:
+            request: The decoded request.
+            sessions: The sessions of the connection by id.
+        """
+        width = int(request["width"])
+        height = int(request["height"])
+        numMines = int(request["mines"])
+        seed = request.get("seed")
+        if width <= 0 or height <= 0 or numMines < 0:
+            raise ValueError("width, height and mines must be positive")
+        if width * height > MAX_CELLS:
+            raise ValueError("board larger than {} cells".format(MAX_CELLS))
+        noGuess = bool(request.get("noGuess", False))
+        if noGuess and width * height > MAX_NO_GUESS_CELLS:
+            raise ValueError("no guess board larger than {} cells".format(MAX_NO_GUESS_CELLS))
+        if seed is not None and int(seed) < 0:
+            raise ValueError("seed must be positive")
+        if self.sessionCount >= MAX_SESSIONS or self.cellCount + width * height > MAX_TOTAL_CELLS:
+            raise ValueError("too many sessions")
+
+        game = session.Session(width, height, numMines, seed if seed is None else int(seed),
+            noGuess)
+        sessionId = next(self.ids)
+        sessions[sessionId] = game
+        self.sessionCount += 1
+        self.cellCount += game.board.size
+        return {"session": sessionId, "width": game.width, "height": game.height,
+            "mines": game.numMines, "seed": game.board.seed}
+
+    def drop(self, game):
+        """
+        Takes a closed session off the counters.
+        """
+        self.sessionCount -= 1
+        self.cellCount -= game.board.size
+
+    def stats(self):
+        """
+        Returns the number of sessions and requests served so far.
+        """
+        elapsed = time.perf_counter() - self.startTime
+        return {"sessions": self.sessionCount, "cells": self.cellCount,
+            "requests": self.requestCount, "requestsPerSecond": self.requestCount / elapsed}
+
+    async def report(self, interval = REPORT_INTERVAL):
+        """
+        Prints the number of sessions and the requests per second every interval
+        in which requests were served.
+        """
+        count = self.requestCount
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            if self.requestCount != count:
+                print("{} sessions, {:.0f} requests/s".format(self.sessionCount,
+                    (self.requestCount - count) / (now - last)), flush = True)
+            count = self.requestCount
+            last = now
+
+async def listen(server, host = HOST, port = PORT, path = None):
+    """
+    Starts listening for connections and returns the asyncio server.
+    Params:
+        server: The Server serving the connections.
+        host: Address to listen on. Only local connections are meant to be served.
+        port: TCP port, or 0 for any free port.
+        path: Path of a Unix socket to listen on instead of TCP.
+    """
+    if path:
+        return await asyncio.start_unix_server(server.handle, path, limit = MAX_LINE)
+    return await asyncio.start_server(server.handle, host, port, limit = MAX_LINE)
+
+async def serve(host = HOST, port = PORT, path = None):
+    """
+    Serves until interrupted and reports the request rate.
+    """
+    server = Server()
+    listener = await listen(server, host, port, path)
+    print("Serving on " + (path or "{}:{}".format(host, port)), flush = True)
+    reporter = asyncio.ensure_future(server.report())
+    try:
+        await listener.serve_forever()
+    finally:
+        reporter.cancel()
+
+async def playGames(host, port, path, games, width, height, numMines, seed):
+    """
+    A bot that plays games over one connection by revealing random hidden cells.
+    Returns the number of requests sent and games won.
+    Params:
+        host: Address of the server.
+        port: TCP port of the server.
+        path: Path of the Unix socket of the server, used instead of TCP if given.
+        games: Number of games to be played.
+        width: Width of the boards in cells.
+        height: Height of the boards in cells.
+        numMines: Number of mines on each board.
+        seed: Seed of the first game and of the bot.
+    """
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path, limit = MAX_RESPONSE)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit = MAX_RESPONSE)
+
+    async def call(request):
+        writer.write(encode(request))
+        return json.loads(await reader.readline())
+
+    generator = random.Random(seed)
+    requests = 0
+    wins = 0
+    for i in range(games):
+        sessionId = (await call({"cmd": "new", "width": width, "height": height,
+            "mines": numMines, "seed": seed + i}))["session"]
+        view = bytearray(b"#" * (width * height))
+        index = width // 2 + height // 2 * width
+        requests += 2
+
+        status = {"hasEnded": False}
+        while not status["hasEnded"]:
+            while view[index] != ord("#"):
+                index = generator.randrange(len(view))
+            response = await call({"cmd": "reveal", "session": sessionId,
+                "x": index % width, "y": index // width})
+            requests += 1
+            for start, cells in response["spans"]:
+                view[start:start + len(cells)] = cells.encode("ascii")
+            status = response["status"]
+        wins += not status["hasFailed"]
+        await call({"cmd": "close", "session": sessionId})
+
+    writer.close()
+    return requests, wins
+
+async def load(clients, games, width, height, numMines, host = HOST, port = PORT, path = None,
+        connect = False):
+    """
+    Plays games with many bots at once and prints the request rate. Serves them
+    from this process unless connect is set.
+    Params:
+        clients: Number of bots playing at the same time.
+        games: Number of games each bot plays.
+        width: Width of the boards in cells.
+        height: Height of the boards in cells.
+        numMines: Number of mines on each board.
+        host: Address of the server.
+        port: TCP port of the server.
+        path: Path of the Unix socket of the server, used instead of TCP if given.
+        connect: Load a running server instead of serving the bots here.
+    """
+    listener = None
+    if not connect:
+        listener = await listen(Server(), host, 0 if path is None else port, path)
+        if path is None:
+            port = listener.sockets[0].getsockname()[1]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(playGames(host, port, path, games, width, height, numMines,
+        i * games) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    if listener:
+        listener.close()
+        await listener.wait_closed()
+    requests = sum(result[0] for result in results)
+    print("{} bots played {} games, won {}, {} requests in {:.2f} s, {:.0f} requests/s".format(
+        clients, clients * games, sum(result[1] for result in results), requests, elapsed,
+        requests / elapsed))
+
+def main():
+    """
+    Parses the command line and serves, or runs a load test.
+    """
+    parser = argparse.ArgumentParser(description = "Serves headless minesweeper sessions to bots.")
+    parser.add_argument("--host", default = HOST, help = "address to listen on, local only by default")
+    parser.add_argument("--port", type = int, default = PORT, help = "TCP port to listen on")
+    parser.add_argument("--unix", metavar = "PATH", help = "listen on a Unix socket instead")
+    parser.add_argument("--load", type = int, metavar = "CLIENTS",
+        help = "play games with this many bots at once and report the request rate")
+    parser.add_argument("--connect", action = "store_true",
+        help = "load a running server instead of one in this process")
+    parser.add_argument("--games", type = int, default = 10, help = "games played by each bot")
+    parser.add_argument("-W", "--width", type = int, default = 16)
+    parser.add_argument("-H", "--height", type = int, default = 16)
+    parser.add_argument("-m", "--mines", type = int, default = 40)
+    args = parser.parse_args()
+
+    try:
+        if args.load:
+            asyncio.run(load(args.load, args.games, args.width, args.height, args.mines,
+                args.host, args.port, args.unix, args.connect))
+        else:
+            asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the session class.
+"""
+import board
+import endless
+
+class Session:
+    """
+    A class representing a game of minesweeper without any graphics. Applies the
+    rules on top of a board. Every move returns the cells it changed as a list of
+    (start, stop) spans of flat indices, so bots and the grid can react to them.
+    """
+    def __init__(self, width, height, numMines, seed = None, noGuess = False, isEndless = False):
+        """
+        The constructor initializes variables and creates the board.
+        Params:
+            width: Width of the board in cells.
+            height: Height of the board in cells.
+            numMines: Number of mines to be armed.
+            seed: Seed of the mine placement. A random seed is picked if None.
+            noGuess: Only generate boards that can be cleared without guessing.
+            isEndless: Play on an endless chunked board instead, with the mine density
+                of the given size and number of mines. The game only ends on a mine.
+        """
+        if isEndless:
+            self.board = endless.ChunkedBoard(numMines / (width * height), seed)
+        else:
+            self.board = board.Board(width, height, numMines, seed, noGuess)
+        self.width = self.board.width
+        self.height = self.board.height
+        self.numMines = self.board.numMines
+        self.moveCounter = 0
+        self.hasEnded = False
+        self.hasFailed = False
+
+    def reveal(self, x, y):
+        """
+        Reveals a cell. The first move of the game arms the board around it.
+        Params:
+            x: X location of the cell.
+            y: Y location of the cell.
+        """
+        index = self.board.index(x, y)
+        if self.hasEnded or self.board.state[index] & (board.VISIBLE | board.FLAG):
+            return []
+        if not self.board.isArmed:
+            self.board.arm(index)
+
+        self.moveCounter += 1
+        spans = self.board.reveal(index)
+        return spans + self.check()
+
+    def flag(self, x, y):
+        """
+        Toggles the flag of a hidden cell on and off.
+        Params:
+            x: X location of the cell.
+            y: Y location of the cell.
+        """
+        index = self.board.index(x, y)
+        if self.hasEnded or self.board.isVisible(index):
+            return []
+        if not self.board.isArmed:
+            self.board.arm(index)
+
+        self.moveCounter += 1
+        self.board.toggleFlag(index)
+        return [(index, index + 1)]
+
+    def chord(self, x, y):
+        """
+        Reveals every unflagged neighbour of a visible number whose neighbouring
+        flags match it. All the neighbours are revealed as one batch and move.
+        Params:
+            x: X location of the cell.
+            y: Y location of the cell.
+        """
+        b = self.board
+        state = b.state
+        index = b.index(x, y)
+        if self.hasEnded or not state[index] & board.VISIBLE or state[index] & board.MINE:
+            return []
+
+        neighbours = b.neighbours(index)
+        flags = 0
+        for n in neighbours:
+            if state[n] & board.FLAG:
+                flags += 1
+        if flags != state[index] & board.NEIGHBOURS:
+            return []
+
+        spans = b.revealAll(neighbours)
+        if not spans:
+            return []
+
+        self.moveCounter += 1
+        return spans + self.check()
+
+    def check(self):
+        """
+        Ends the game if a mine was revealed or every safe cell is visible. Both are
+        read from the counters of the board, so the check takes constant time.
+        Returns the cells changed by ending the game.
+        """
+        if self.board.visibleMineCounter:
+            return self.fail()
+        if self.checkWin():
+            return self.win()
+        return []
+
+    def checkWin(self):
+        """
+        Checks if the win condition of minesweeper (All safe cells are revealed) is met.
+        """
+        cellCount = self.width * self.height - self.numMines
+        return self.board.visibleCellCounter == cellCount
+
+    def win(self):
+        """
+        A method for initiating the victory proceedings.
+        """
+        spans = self.showAll()
+        self.hasFailed = False
+        self.hasEnded = True
+        return spans
+
+    def fail(self):
+        """
+        A method for initiating the failure proceedings.
+        """
+        spans = self.showAll()
+        self.hasFailed = True
+        self.hasEnded = True
+        return spans
+
+    def showAll(self):
+        """
+        Sets all hidden cells visible and returns them as spans.
+        """
+        return self.board.showAll()
+
+    def status(self):
+        """
+        Returns the counters of the board and the state of the game as a dictionary.
+        """
+        status = self.board.status()
+        status["moves"] = self.moveCounter
+        status["hasEnded"] = self.hasEnded
+        status["hasFailed"] = self.hasFailed
+        return status
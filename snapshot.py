@@ -0,0 +1,135 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the snapshot class and the save, release and discard functions.
+
+A snapshot file starts with the state array of the board, one byte per cell
+with the bits defined in the board module. It is followed by the replay of the
+game so far, which also holds the size, mines and seed of the board, and ends in
+a fixed size trailer. Keeping the state at the start of the file lets it be
+memory-mapped as it is, so resuming doesn't read or convert any cells.
+"""
+import mmap
+import os
+import struct
+import time
+import replay
+
+SAVE_FILE = "save.msw"
+MAGIC = b"MSS\x02"
+#Magic, flags, moves, visible cells, flagged cells, timer, replay length and the time
+#of the last move.
+TRAILER = struct.Struct("<4sIIQQdIQ")
+SOLVABLE = 0x01
+
+def save(gridRef, timer, filename = SAVE_FILE):
+    """
+    Writes an armed, unfinished game into a snapshot file. The file is written
+    next to the old one and swapped in, so a crash never leaves a broken save.
+    Params:
+        gridRef: A reference to the grid of the game.
+        timer: Seconds played so far.
+        filename: Name of the snapshot file.
+    """
+    #A resumed game maps the file about to be replaced, so it is copied off first.
+    release(gridRef)
+    b = gridRef.board
+    recording = gridRef.recorder.getBytes()
+    trailer = TRAILER.pack(MAGIC, SOLVABLE if b.isSolvable else 0, gridRef.moveCounter,
+        b.visibleCellCounter, b.flagCounter, timer, len(recording), gridRef.recorder.millis)
+
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as target:
+        target.write(b.state)
+        target.write(recording)
+        target.write(trailer)
+    os.replace(temporary, filename)
+
+def release(gridRef):
+    """
+    Copies the state of a resumed game off its snapshot file into memory and
+    unmaps the file. Windows can't replace or delete a file while it is mapped.
+    Does nothing for a game that was not resumed.
+    Params:
+        gridRef: A reference to the grid of the game.
+    """
+    b = gridRef.board
+    if isinstance(b.state, mmap.mmap):
+        state = b.state
+        b.state = bytearray(state)
+        state.close()
+
+def discard(filename = SAVE_FILE, gridRef = None):
+    """
+    Deletes a snapshot file if there is one.
+    Params:
+        filename: Name of the snapshot file.
+        gridRef: A reference to the grid of a game resumed from the file, which
+            is released from it first.
+    """
+    if gridRef is not None:
+        release(gridRef)
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+class Snapshot:
+    """
+    A class representing a saved game. The state array is memory-mapped
+    copy-on-write, so the board can be played straight from the file without
+    changing it.
+    """
+    def __init__(self, filename = SAVE_FILE):
+        """
+        The constructor reads the trailer and the replay and maps the state array.
+        Raises ValueError if the file is not a snapshot.
+        Params:
+            filename: Name of the snapshot file.
+        """
+        with open(filename, "rb") as source:
+            fileSize = os.fstat(source.fileno()).st_size
+            if fileSize < TRAILER.size:
+                raise ValueError("Not a snapshot")
+            source.seek(fileSize - TRAILER.size)
+            magic, flags, moves, visible, flagged, timer, length, millis = TRAILER.unpack(
+                source.read(TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError("Not a snapshot")
+
+            source.seek(fileSize - TRAILER.size - length)
+            self.recording = source.read(length)
+            header = replay.readHeader(self.recording)
+            self.width, self.height, self.numMines, self.seed, self.noGuess = header[:5]
+            size = self.width * self.height
+            if size + length + TRAILER.size != fileSize:
+                raise ValueError("Broken snapshot")
+            self.state = mmap.mmap(source.fileno(), size, access = mmap.ACCESS_COPY)
+
+        self.isSolvable = bool(flags & SOLVABLE)
+        self.moveCounter = moves
+        self.visibleCellCounter = visible
+        self.flagCounter = flagged
+        self.timer = timer
+        self.millis = millis
+
+    def restore(self, gridRef):
+        """
+        Puts the saved game into a newly created grid of the same size and seed.
+        Params:
+            gridRef: A reference to the grid.
+        """
+        b = gridRef.board
+        b.state = self.state
+        b.isArmed = True
+        b.isSolvable = self.isSolvable
+        b.visibleCellCounter = self.visibleCellCounter
+        b.flagCounter = self.flagCounter
+        gridRef.session.moveCounter = self.moveCounter
+
+        recorder = gridRef.recorder
+        recorder.data = bytearray(self.recording)
+        recorder.millis = self.millis
+        recorder.startTime = time.perf_counter() - self.timer
+
+        gridRef.viewport.refresh()
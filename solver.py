@@ -0,0 +1,621 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the solver class and the armSolvable function.
+"""
+import math
+import board
+
+MAX_ATTEMPTS = 20
+MAX_REPAIRS = 10000
+#Work armSolvable may do before it settles for an ordinary random board, about a
+#second. Counted in revealed cells and DEDUCE_COST per round of deductions rather
+#than timed, so a seed always gives the same board.
+NO_GUESS_BUDGET = 70000
+DEDUCE_COST = 50
+INTERIOR_TRIES = 200
+#Components with more unknown cells than this are not enumerated, and an
+#enumeration is abandoned after visiting this many search nodes.
+MAX_COMPONENT_CELLS = 40
+MAX_SEARCH_NODES = 5000
+CACHE_SIZE = 4096
+
+class Solver:
+    """
+    A solver that only looks at the numbers a player could see. The frontier
+    (revealed numbers next to hidden cells) is kept up to date from the spans every
+    reveal returns, and only the constraints around changed cells are reconsidered.
+    Deductions go from single cells to overlapping pairs of constraints to an
+    exact enumeration of every independent part of the frontier.
+    """
+    def __init__(self, boardRef):
+        """
+        The constructor initializes variables.
+        Params:
+            boardRef: A reference to the board to be solved.
+        """
+        self.board = boardRef
+        self.startIndex = None
+        self.isStale = False
+        #Enumeration results of frontier components, keyed by their constraints.
+        self.cache = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets everything deduced so far.
+        """
+        #Cells known to be mines and hidden cells known to be safe.
+        self.mines = set()
+        self.safe = set()
+        #Revealed numbered cells with hidden unknown neighbours.
+        self.frontier = set()
+        #Frontier cells whose constraint has to be recomputed.
+        self.dirty = set()
+        #Frontier cells waiting to be compared with their neighbours.
+        self.unpaired = set()
+        #The current constraint of every undecided frontier cell.
+        self.constraints = {}
+
+    def update(self, revealed):
+        """
+        Adds newly revealed numbered cells to the frontier and marks the frontier
+        cells next to any revealed cell for reconsideration.
+        Params:
+            revealed: The (start, stop) spans returned by the boards reveal method.
+        """
+        state = self.board.state
+        for start, stop in revealed:
+            for index in range(start, stop):
+                self.safe.discard(index)
+                if state[index] & board.NEIGHBOURS and not state[index] & board.MINE:
+                    self.frontier.add(index)
+                    self.dirty.add(index)
+                self.markDirty(index)
+
+    def markDirty(self, index):
+        """
+        Marks the frontier cells around a changed cell for reconsideration.
+        """
+        for n in self.board.neighbours(index):
+            if n in self.frontier:
+                self.dirty.add(n)
+
+    def addMine(self, index):
+        """
+        Records a cell as a known mine.
+        """
+        if index not in self.mines:
+            self.mines.add(index)
+            self.markDirty(index)
+
+    def addSafe(self, index):
+        """
+        Records a hidden cell as known to be safe.
+        """
+        if index not in self.safe:
+            self.safe.add(index)
+            self.markDirty(index)
+
+    def constraint(self, index):
+        """
+        Returns the hidden unknown neighbours of a frontier cell and the number
+        of mines still among them.
+        Params:
+            index: Flat index of a revealed numbered cell.
+        """
+        state = self.board.state
+        unknown = []
+        need = state[index] & board.NEIGHBOURS
+        for n in self.board.neighbours(index):
+            if n in self.mines:
+                need -= 1
+            elif not state[n] & board.VISIBLE and n not in self.safe:
+                unknown.append(n)
+        return frozenset(unknown), need
+
+    def pendingSafe(self):
+        """
+        Returns the known safe cells that are still hidden.
+        """
+        state = self.board.state
+        return set(i for i in self.safe if not state[i] & board.VISIBLE)
+
+    def deduce(self):
+        """
+        Returns a set of cells that are certainly safe. Cells that are certainly
+        mines are added to the known mines. Uses single point deductions first,
+        compares overlapping constraints only when those give nothing and enumerates
+        the frontier only when both fail. Repeats while new mines are found, since
+        they can make further cells safe.
+        """
+        while True:
+            safe = self.pendingSafe()
+            if safe:
+                return safe
+            knownMines = len(self.mines)
+            for step in (self.deduceSingle, self.deduceSubsets, self.deduceExact):
+                step()
+                if self.dirty or len(self.mines) > knownMines or self.pendingSafe():
+                    break
+            else:
+                return self.deduceGlobal()
+
+    def deduceSingle(self):
+        """
+        Recomputes the constraints of the dirty frontier cells. A constraint with no
+        mines left makes its cells safe, one with as many mines as cells makes them mines.
+        """
+        while self.dirty:
+            index = self.dirty.pop()
+            unknown, need = self.constraint(index)
+            if not unknown:
+                self.frontier.discard(index)
+                self.constraints.pop(index, None)
+            elif need == 0:
+                for n in unknown:
+                    self.addSafe(n)
+            elif need == len(unknown):
+                for n in unknown:
+                    self.addMine(n)
+            else:
+                self.constraints[index] = (unknown, need)
+                self.unpaired.add(index)
+
+    def deduceSubsets(self):
+        """
+        Compares the constraints that changed with the constraints around them.
+        If one set of unknown cells contains another, the cells left over hold the
+        difference of their mines.
+        """
+        constraints = self.constraints
+        while self.unpaired:
+            index = self.unpaired.pop()
+            if index not in constraints:
+                continue
+            for other in self.nearbyFrontier(index):
+                if index not in constraints or other not in constraints:
+                    continue
+                a, b = constraints[index], constraints[other]
+                if a[0] < b[0]:
+                    self.deduceSubset(a, b)
+                elif b[0] < a[0]:
+                    self.deduceSubset(b, a)
+
+    def deduceSubset(self, small, large):
+        """
+        Applies the subset rule to a pair of constraints where the unknown cells
+        of small are a subset of the unknown cells of large.
+        """
+        rest = large[0] - small[0]
+        mines = large[1] - small[1]
+        if mines == 0:
+            for n in rest:
+                self.addSafe(n)
+        elif mines == len(rest):
+            for n in rest:
+                self.addMine(n)
+
+    def deduceExact(self):
+        """
+        Marks every cell whose mine probability is exactly zero or one.
+        """
+        numerators, interior, total = self.countSolutions()
+        if not total:
+            return
+        for index, count in numerators.items():
+            if count == 0:
+                self.addSafe(index)
+            elif count == total:
+                self.addMine(index)
+
+    def deduceGlobal(self):
+        """
+        Uses the total number of mines. If every mine is already known, all the
+        remaining hidden cells are safe.
+        """
+        b = self.board
+        if b.numMines > len(self.mines):
+            return set()
+        state = b.state
+        return set(i for i in range(b.size)
+            if not state[i] & board.VISIBLE and i not in self.mines)
+
+    def components(self):
+        """
+        Splits the current constraints into independent groups that share no unknown
+        cells. Returns a list of lists of constraints.
+        """
+        owner = {}
+        groups = {}
+        for index, (unknown, need) in self.constraints.items():
+            merged = set()
+            for n in unknown:
+                if n in owner:
+                    merged.add(owner[n])
+            group = [(unknown, need)]
+            for other in merged:
+                group += groups.pop(other)
+            groups[index] = group
+            for constraint in group:
+                for n in constraint[0]:
+                    owner[n] = index
+        return list(groups.values())
+
+    def enumerate(self, constraints):
+        """
+        Counts the mine arrangements that satisfy a component. Returns a tuple of
+        the cells and a dictionary mapping a number of mines to the number of
+        arrangements with that many mines and the number of those arrangements in
+        which each cell is a mine. Results are cached, so components the last move
+        did not touch are not enumerated again. Returns None for components that
+        are too large or take too long.
+        Params:
+            constraints: A list of (unknown cells, mines) tuples.
+        """
+        key = tuple(sorted((tuple(sorted(unknown)), need) for unknown, need in constraints))
+        if key in self.cache:
+            return self.cache[key]
+
+        cells = sorted(set().union(*(unknown for unknown, need in constraints)))
+        if len(cells) > MAX_COMPONENT_CELLS:
+            self.cache[key] = None
+            return None
+
+        position = {cell: i for i, cell in enumerate(cells)}
+        needs = [need for unknown, need in constraints]
+        left = [len(unknown) for unknown, need in constraints]
+        owners = [[] for cell in cells]
+        for c, (unknown, need) in enumerate(constraints):
+            for n in unknown:
+                owners[position[n]].append(c)
+
+        results = {}
+        assignment = [0] * len(cells)
+        budget = [MAX_SEARCH_NODES]
+
+        def search(i, mines):
+            budget[0] -= 1
+            if budget[0] < 0:
+                return
+            if i == len(cells):
+                if mines not in results:
+                    results[mines] = [0, [0] * len(cells)]
+                result = results[mines]
+                result[0] += 1
+                tallies = result[1]
+                for j, value in enumerate(assignment):
+                    tallies[j] += value
+                return
+            for value in (0, 1):
+                isValid = True
+                for c in owners[i]:
+                    needs[c] -= value
+                    left[c] -= 1
+                    if needs[c] < 0 or needs[c] > left[c]:
+                        isValid = False
+                if isValid:
+                    assignment[i] = value
+                    search(i + 1, mines + value)
+                for c in owners[i]:
+                    needs[c] += value
+                    left[c] += 1
+            assignment[i] = 0
+
+        search(0, 0)
+
+        result = (cells, results)
+        if budget[0] < 0:
+            result = None
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def countSolutions(self):
+        """
+        Combines the enumerated components with the cells outside the frontier and
+        the number of mines left. Returns a dictionary mapping frontier cells to
+        the weighted number of solutions in which they are mines, the same number
+        for a single cell outside the frontier and the weighted number of all
+        solutions. Dividing by the last gives exact probabilities.
+        """
+        self.deduceSingle()
+        b = self.board
+        remaining = b.numMines - len(self.mines)
+
+        #The cells of components too large to enumerate are counted with the cells
+        #outside the frontier, as if nothing constrained them. That counts every
+        #real arrangement and some impossible ones, so the probabilities become
+        #approximate but a cell is only ever deduced when the real board agrees.
+        results = []
+        frontierCells = set()
+        for constraints in self.components():
+            result = self.enumerate(constraints)
+            if result:
+                results.append(result)
+                frontierCells.update(result[0])
+
+        hidden = b.size - b.visibleCellCounter
+        interior = hidden - len(self.mines) - len(self.pendingSafe()) - len(frontierCells)
+
+        polynomials = []
+        for cells, solutions in results:
+            polynomial = [0] * (max(solutions) + 1)
+            for mines, (count, tallies) in solutions.items():
+                polynomial[mines] = count
+            polynomials.append(polynomial)
+
+        prefix = [[1]]
+        for polynomial in polynomials:
+            prefix.append(convolve(prefix[-1], polynomial))
+        suffix = [[1]]
+        for polynomial in reversed(polynomials):
+            suffix.append(convolve(suffix[-1], polynomial))
+        suffix.reverse()
+
+        full = prefix[-1]
+
+        #An arrangement of the frontier is weighted by the ways to place the other
+        #mines outside it, a binomial of the whole board. Only the ratios matter,
+        #so every weight is divided by the same factor, which leaves small integers
+        #that step from one to the next by (interior - j + 1) / j.
+        weights = {}
+        low = max(remaining - len(full) + 1, 0)
+        high = min(remaining, interior)
+        if low <= high:
+            value = math.prod(range(low + 1, high + 1))
+            weights[low] = value
+            for j in range(low + 1, high + 1):
+                value = value * (interior - j + 1) // j
+                weights[j] = value
+
+        def weight(mines):
+            return weights.get(remaining - mines, 0) * scale
+
+        #A cell outside the frontier is a mine in j / interior of the ways to place
+        #j mines there, so the other counts are scaled by interior to stay integers.
+        scale = max(interior, 1)
+        total = sum(count * weight(mines) for mines, count in enumerate(full))
+        interiorCount = sum(count * weights.get(remaining - mines, 0) * (remaining - mines)
+            for mines, count in enumerate(full))
+
+        numerators = {}
+        for i, (cells, solutions) in enumerate(results):
+            others = convolve(prefix[i], suffix[i + 1])
+            for mines, (count, tallies) in solutions.items():
+                factor = sum(c * weight(mines + t) for t, c in enumerate(others))
+                for j, cell in enumerate(cells):
+                    numerators[cell] = numerators.get(cell, 0) + tallies[j] * factor
+
+        return numerators, interiorCount, total
+
+    def probabilities(self):
+        """
+        Returns a dictionary mapping every undecided frontier cell to its exact mine
+        probability, and the mine probability of any other hidden unknown cell.
+        """
+        numerators, interior, total = self.countSolutions()
+        if not total:
+            return {}, 1.0
+        cells = {index: count / total for index, count in numerators.items()}
+        return cells, interior / total
+
+    def hint(self):
+        """
+        Returns the safest cell to reveal next and its mine probability, or None
+        if there are no hidden unknown cells.
+        """
+        safe = self.deduce()
+        if safe:
+            return min(safe), 0.0
+        return self.guess()
+
+    def guess(self):
+        """
+        Returns the hidden unknown cell with the lowest mine probability and the
+        probability, for when nothing can be deduced.
+        """
+        cells, interiorProbability = self.probabilities()
+        best = None
+        if cells:
+            best = min(cells, key = cells.get)
+            if cells[best] <= interiorProbability:
+                return best, cells[best]
+
+        index = self.findUnknown(cells)
+        if index is None:
+            if best is None:
+                return None
+            return best, cells[best]
+        return index, interiorProbability
+
+    def findUnknown(self, exclude):
+        """
+        Returns a random hidden cell that is not known and not in exclude, or None.
+        """
+        b = self.board
+        state = b.state
+
+        def isUnknown(index):
+            return not (state[index] & board.VISIBLE or index in self.mines
+                or index in self.safe or index in exclude)
+
+        for i in range(INTERIOR_TRIES):
+            index = b.random.randrange(b.size)
+            if isUnknown(index):
+                return index
+        for index in range(b.size):
+            if isUnknown(index):
+                return index
+        return None
+
+    def nearbyFrontier(self, index):
+        """
+        Returns the frontier cells that can share unknown cells with a frontier cell.
+        """
+        width = self.board.width
+        height = self.board.height
+        y, x = divmod(index, width)
+        arr = []
+        for j in range(max(y - 2, 0), min(y + 3, height)):
+            for i in range(max(x - 2, 0), min(x + 3, width)):
+                other = j * width + i
+                if other != index and other in self.frontier:
+                    arr.append(other)
+        return arr
+
+    def solve(self, startIndex, repair = False, budget = None):
+        """
+        Plays the board from a safe start using deductions only. Returns True if
+        every safe cell was revealed.
+        Params:
+            startIndex: Flat index of the first click.
+            repair: Move mines away from the frontier whenever the solver gets stuck.
+            budget: A one item list of the work left, see NO_GUESS_BUDGET. The work
+                done is taken off it and the solver gives up once it runs out.
+        """
+        b = self.board
+        target = b.size - b.numMines
+        self.startIndex = startIndex
+
+        def reveal(index):
+            spans = b.reveal(index)
+            if budget is not None:
+                budget[0] -= sum(stop - start for start, stop in spans)
+            self.update(spans)
+
+        reveal(startIndex)
+        repairs = 0
+        while b.visibleCellCounter < target:
+            if budget is not None:
+                if budget[0] < 0:
+                    return False
+                budget[0] -= DEDUCE_COST
+            safe = self.deduce()
+            if not safe:
+                if not repair or repairs >= MAX_REPAIRS:
+                    return False
+                repairs += 1
+                if not self.repair():
+                    return False
+                if self.isStale:
+                    #The repair changed numbers earlier deductions relied on, so start over
+                    self.isStale = False
+                    b.hideAll()
+                    self.reset()
+                    reveal(startIndex)
+                continue
+            for index in safe:
+                reveal(index)
+
+        return True
+
+    def repair(self):
+        """
+        Moves the mines around a random stuck frontier cell elsewhere, which makes
+        its remaining neighbours safe. Mines are moved into the unexplored interior
+        when possible. Otherwise they are moved into any other safe cell and isStale
+        is set, since earlier deductions may no longer hold. Returns False if there
+        was nowhere to move the mines.
+        """
+        b = self.board
+        state = b.state
+        if not self.frontier:
+            return False
+        index = b.random.choice(sorted(self.frontier))
+        unknown, need = self.constraint(index)
+
+        for n in unknown:
+            if state[n] & board.MINE:
+                target = self.findInterior()
+                if target is None:
+                    target = self.findSafe(unknown)
+                    if target is None:
+                        return False
+                    self.isStale = True
+                b.moveMine(n, target)
+                self.markDirty(n)
+                self.markDirty(target)
+        return True
+
+    def findInterior(self):
+        """
+        Returns a random hidden safe cell without revealed neighbours, or None.
+        Moving a mine there changes no number the solver has seen.
+        """
+        b = self.board
+        state = b.state
+        for i in range(INTERIOR_TRIES):
+            index = b.random.randrange(b.size)
+            if state[index] & (board.MINE | board.VISIBLE):
+                continue
+            if not any(state[n] & board.VISIBLE for n in b.neighbours(index)):
+                return index
+        return None
+
+    def findSafe(self, exclude):
+        """
+        Returns a random safe cell outside of exclude and the opening of the first
+        click, or None.
+        """
+        b = self.board
+        state = b.state
+        exclude = set(exclude)
+        exclude.add(self.startIndex)
+        exclude.update(b.neighbours(self.startIndex))
+        cells = [i for i in range(b.size) if not state[i] & board.MINE and i not in exclude]
+        if not cells:
+            return None
+        return b.random.choice(cells)
+
+def convolve(a, b):
+    """
+    Multiplies two polynomials given as lists of coefficients.
+    """
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+def armSolvable(boardRef, safeIndex):
+    """
+    Arms a board so that it can be cleared without guessing from the safe cell.
+    The safe cell is given an opening when there is room for one. Stuck boards are
+    repaired by moving mines and then solved again from scratch, since repairs can
+    change numbers that earlier deductions relied on. Gives up after MAX_ATTEMPTS
+    or once NO_GUESS_BUDGET runs out, places the mines again at random and returns
+    False. Either way the board only depends on its seed.
+    Params:
+        boardRef: A reference to the board to be armed.
+        safeIndex: Flat index of the first click.
+    """
+    safeIndices = [safeIndex]
+    if boardRef.size - 9 >= boardRef.numMines:
+        safeIndices += boardRef.neighbours(safeIndex)
+
+    boardRef.clearMines()
+    boardRef.placeMines(safeIndices)
+    boardRef.countNeighbours()
+
+    budget = [NO_GUESS_BUDGET]
+    for attempt in range(MAX_ATTEMPTS):
+        Solver(boardRef).solve(safeIndex, True, budget)
+        boardRef.hideAll()
+        if budget[0] < 0:
+            break
+        if Solver(boardRef).solve(safeIndex, budget = budget):
+            boardRef.hideAll()
+            return True
+        boardRef.hideAll()
+        if budget[0] < 0:
+            break
+
+    #Repairs leave a layout shaped by the solver, so a board that stays unsolved
+    #is replaced by one placed like any other.
+    boardRef.clearMines()
+    boardRef.placeMines(safeIndices)
+    boardRef.countNeighbours()
+    return False
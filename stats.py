@@ -0,0 +1,282 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the stats class and the readFile function.
+"""
+import datetime
+import os
+import sqlite3
+import leaderboard
+
+DATABASE = "stats.db"
+LEGACY_FILE = "stats.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    win INTEGER NOT NULL,
+    time REAL NOT NULL,
+    moves INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    replay BLOB,
+    bbbv INTEGER,
+    openings INTEGER,
+    islands INTEGER,
+    endless INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS gamesByName ON games (name);
+CREATE INDEX IF NOT EXISTS gamesBySize ON games (width, height, mines);
+CREATE INDEX IF NOT EXISTS gamesByDate ON games (date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = ["date", "name", "win", "time", "moves", "width", "height", "mines", "bbbv", "endless"]
+#Columns added after the first versions of the database, with their types.
+ADDED_COLUMNS = [("replay", "BLOB"), ("bbbv", "INTEGER"), ("openings", "INTEGER"),
+    ("islands", "INTEGER"), ("endless", "INTEGER NOT NULL DEFAULT 0")]
+
+def readFile(filename):
+    """
+    A simple function for reading the contents of a text file into a string.
+    Params:
+        filename: Filename of the file to be read.
+    """
+    stats = []
+    try:
+        with open(filename) as source:
+            for row in source.readlines():
+                stats.append(row.strip().split(","))
+    except FileNotFoundError:
+        return False
+    else:
+        return stats
+
+def parseTime(timeString):
+    """
+    Converts a time written as "Xm Ys" by older versions into seconds.
+    """
+    minutes, seconds = timeString.split()
+    return int(minutes.rstrip("m")) * 60 + int(seconds.rstrip("s"))
+
+def formatTime(time):
+    """
+    Formats a time in seconds as "Xm Ys".
+    """
+    minutes, seconds = divmod(time, 60)
+    return str(int(minutes)) + "m " + str(int(seconds)) + "s"
+
+def escapeLike(text):
+    """
+    Escapes the wildcards of a LIKE pattern.
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class Stats:
+    """
+    A class representing the statistics of every played game. The games are stored
+    in an indexed SQLite database. A stats.txt file written by older versions is
+    imported the first time the database is opened. Totals per board size and
+    per player are kept up to date as games are added, see the leaderboard module.
+    Games on endless boards are stored but left out of the totals and best times,
+    since they are not played on the board size they are stored with.
+    """
+    def __init__(self, filename = DATABASE, legacyFilename = LEGACY_FILE):
+        """
+        The constructor opens the database and creates it if needed.
+        Params:
+            filename: Name of the database file.
+            legacyFilename: Name of the text file written by older versions.
+        """
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(games)")]
+        #Databases written by older versions get the newer columns added.
+        with self.connection:
+            for column, columnType in ADDED_COLUMNS:
+                if column not in columns:
+                    self.connection.execute(
+                        "ALTER TABLE games ADD COLUMN " + column + " " + columnType)
+            hasEndless = "endless" in columns
+            if not hasEndless:
+                self.markEndless()
+        isNew = leaderboard.create(self.connection)
+        if isNew or not hasEndless or not self.getMeta("aggregated"):
+            #Databases written before the aggregates existed are summed up once.
+            with self.connection:
+                leaderboard.rebuild(self.connection)
+                self.setMeta("aggregated", "1")
+        if legacyFilename and not self.getMeta("imported") and os.path.exists(legacyFilename):
+            self.importText(legacyFilename)
+
+    def getMeta(self, key):
+        """
+        Returns a value from the meta table, or None.
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def setMeta(self, key, value):
+        """
+        Stores a value in the meta table.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def markEndless(self):
+        """
+        Marks the games stored before the endless column existed as endless if
+        their replay says so. Games without a replay can't be told apart.
+        """
+        #The replay module imports this one, so it is imported only when needed.
+        import replay
+        endless = []
+        for gameId, data in self.connection.execute(
+                "SELECT id, replay FROM games WHERE replay IS NOT NULL").fetchall():
+            try:
+                if replay.readHeader(data)[5]:
+                    endless.append((gameId,))
+            except (IndexError, ValueError):
+                pass
+        self.connection.executemany("UPDATE games SET endless = 1 WHERE id = ?", endless)
+
+    def importText(self, filename):
+        """
+        Imports the games from a stats.txt file written by older versions and marks
+        the import as done. Malformed rows are skipped. Returns the number of games imported.
+        Params:
+            filename: Name of the text file.
+        """
+        rows = []
+        for row in readFile(filename) or []:
+            try:
+                rows.append((row[0], row[1], row[2] == "True", parseTime(row[3]),
+                    int(row[4]), int(row[5]), int(row[6]), int(row[7])))
+            except (IndexError, ValueError):
+                pass
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO games (date, name, win, time, moves, width, height, mines) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            leaderboard.rebuild(self.connection)
+            self.setMeta("imported", filename)
+        return len(rows)
+
+    def addGame(self, name, isWin, time, numMoves, width, height, numMines, date = None,
+            replay = None, metrics = None, isEndless = False):
+        """
+        Stores the result of a game.
+        Params:
+            name: Name of the player.
+            isWin: Did the player win the game or not.
+            time: The time it took to play the game in seconds.
+            numMoves: The number of moves played during the game.
+            width: The width of the minefield in cells.
+            height: The height of the minefield in cells.
+            numMines: The number of active mines in the minefield.
+            date: When the game was played. Defaults to now.
+            replay: The replay of the game as bytes, see the replay module.
+            metrics: The difficulty metrics of the board, see the metrics module.
+            isEndless: Was the game played on an endless board with the density of
+                the given size. Such games are left out of the totals.
+        """
+        if date is None:
+            date = datetime.datetime.now()
+        metrics = metrics or {}
+        bbbv = metrics.get("bbbv")
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO games (date, name, win, time, moves, width, height, mines, replay, "
+                "bbbv, openings, islands, endless) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(date), name, bool(isWin), time, numMoves, width, height, numMines, replay,
+                bbbv, metrics.get("openings"), metrics.get("islands"), bool(isEndless)))
+            if not isEndless:
+                leaderboard.record(self.connection, name, isWin, time, numMoves, width, height,
+                    numMines, bbbv)
+
+    def countGames(self, nameFilter = ""):
+        """
+        Returns the number of stored games.
+        Params:
+            nameFilter: Only count games of players whose name contains this.
+        """
+        where, params = self.filterClause(nameFilter)
+        return self.connection.execute("SELECT COUNT(*) FROM games" + where, params).fetchone()[0]
+
+    def getGames(self, offset = 0, limit = -1, orderBy = "date", descending = True, nameFilter = ""):
+        """
+        Returns stored games as a list of rows of the game id followed by COLUMNS. Sorting,
+        filtering and paging are done by the database.
+        Params:
+            offset: Number of rows to skip.
+            limit: Maximum number of rows to return. Negative means no limit.
+            orderBy: Name of the column to sort by.
+            descending: Sort from largest to smallest.
+            nameFilter: Only return games of players whose name contains this.
+        """
+        if orderBy not in COLUMNS:
+            raise ValueError("Unknown column: " + str(orderBy))
+        direction = " DESC" if descending else " ASC"
+        where, params = self.filterClause(nameFilter)
+        return self.connection.execute(
+            "SELECT id, " + ", ".join(COLUMNS) + " FROM games" + where
+            + " ORDER BY " + orderBy + direction + ", id" + direction + " LIMIT ? OFFSET ?",
+            params + (limit, offset)).fetchall()
+
+    def getReplay(self, gameId):
+        """
+        Returns the replay of a game, or None if it has none.
+        Params:
+            gameId: The id of the game as returned by getGames.
+        """
+        row = self.connection.execute("SELECT replay FROM games WHERE id = ?", (gameId,)).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def getReplays(self):
+        """
+        Returns (replay, win, moves) of every game that has a replay.
+        """
+        return self.connection.execute(
+            "SELECT replay, win, moves FROM games WHERE replay IS NOT NULL").fetchall()
+
+    def getBoards(self):
+        """
+        Returns the cached totals of every board size, see leaderboard.getBoards.
+        """
+        return leaderboard.getBoards(self.connection)
+
+    def getPlayers(self, limit = 100):
+        """
+        Returns the cached totals of the most active players, see leaderboard.getPlayers.
+        """
+        return leaderboard.getPlayers(self.connection, limit)
+
+    def getBestTimes(self, width, height, numMines, limit = 10):
+        """
+        Returns the fastest wins on a board size, see leaderboard.getBestTimes.
+        """
+        return leaderboard.getBestTimes(self.connection, width, height, numMines, limit)
+
+    def filterClause(self, nameFilter):
+        """
+        Returns the WHERE clause and its parameters for a name filter.
+        """
+        if not nameFilter:
+            return "", ()
+        return " WHERE name LIKE ? ESCAPE '\\'", ("%" + escapeLike(nameFilter) + "%",)
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
@@ -4,25 +4,30 @@ Minesweeper by Jere Koivisto 2020
 This module contains the submit class.
 """
 
-import datetime
 import tkinter as tk
+import gui
 import menu
+import stats
 
 class Submit:
     """
     One of the layer classes. Represents the name submit screen after a game.
     """
-    def __init__(self, filename, isWin, time, numMoves, width, height, numMines):
+    def __init__(self, filename, isWin, time, numMoves, width, height, numMines, replay = None,
+            metrics = None, isEndless = False):
         """
         The constructor initializes variables and creates the tkinter window and widgets.
         Params:
-            filename: Name of the file storing all the statistics.
+            filename: Name of the database storing all the statistics.
             isWin: Did the player win the game or not.
             time: The time it took to play the game.
             numMoves: The number of moves played during the game.
             width: The width of the minefield in cells.
             height: The height of the minefield in cells.
             numMines: The number of active mines in the minefield.
+            replay: The replay of the game as bytes.
+            metrics: The difficulty metrics of the minefield, see the metrics module.
+            isEndless: Was the game played on an endless minefield.
         """
         self.next = None
 
@@ -33,60 +38,65 @@ class Submit:
             "numMoves": numMoves,
             "width": width,
             "height": height,
-            "numMines": numMines
+            "numMines": numMines,
+            "replay": replay,
+            "metrics": metrics,
+            "isEndless": isEndless
         }
 
-        self.root = tk.Tk()
-        self.root.geometry("220x100")
-        self.root.resizable(False, False)
-
         message = ""
         title = ""
         if isWin:
             message = "Congratulations you won!"
             title = "You won!"
+            if metrics and time > 0:
+                message += "\n3BV {}, {:.2f} 3BV/s".format(metrics["bbbv"], metrics["bbbv"] / time)
         else:
             message = "You blew up."
             title = "You lost"
 
-        self.root.title(title)
+        self.root = gui.getRoot(title)
+        self.root.geometry("220x120")
+        self.root.protocol("WM_DELETE_WINDOW", lambda: gui.leave(self.frame))
+        self.frame = tk.Frame(self.root)
+        self.frame.pack()
 
-        self.winLabel = tk.Label(self.root, text = message)
+        self.winLabel = tk.Label(self.frame, text = message)
         self.winLabel.pack()
 
-        self.entryLabel = tk.Label(self.root, text = "Input your name.")
+        self.entryLabel = tk.Label(self.frame, text = "Input your name.")
         self.entryLabel.pack()
 
-        self.nameEntry = tk.Entry(self.root)
+        self.nameEntry = tk.Entry(self.frame)
         self.nameEntry.pack()
 
-        self.button = tk.Button(self.root, text = "Submit", command = self.submitStats)
+        self.button = tk.Button(self.frame, text = "Submit", command = self.submitStats)
         self.button.pack()
 
     def update(self):
         """
         The update method called by the application. Effectively changes the current layer
-        into a menu layer when the submit window is destroyed.
+        into a menu layer when the submit window is closed.
         """
         self.root.mainloop()
         return menu.Menu()
 
     def submitStats(self):
         """
-        Writes the given name and statistics into
-        the specified file and destroys the tkinter window.
+        Stores the given name and statistics into
+        the specified database and leaves the submit window.
         """
-        with open(self.args["filename"], "a") as target:
-            minutes, seconds = divmod(self.args["time"], 60)
-            timeString = str(int(minutes)) + "m " + str(int(seconds)) + "s"
-            target.write("{},{},{},{},{},{},{},{},\n".format(
-                datetime.datetime.now(),
-                self.nameEntry.get().replace(",", "."),
-                self.args["isWin"],
-                timeString,
-                self.args["numMoves"],
-                self.args["width"],
-                self.args["height"],
-                self.args["numMines"],
-            ))
-        self.root.destroy()
+        store = stats.Stats(self.args["filename"])
+        store.addGame(
+            self.nameEntry.get(),
+            self.args["isWin"],
+            self.args["time"],
+            self.args["numMoves"],
+            self.args["width"],
+            self.args["height"],
+            self.args["numMines"],
+            replay = self.args["replay"],
+            metrics = self.args["metrics"],
+            isEndless = self.args["isEndless"])
+        store.close()
+        gui.leave(self.frame)
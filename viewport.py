@@ -0,0 +1,223 @@
+"""
+Minesweeper by Jere Koivisto 2020
+
+This module contains the viewport class.
+"""
+import math
+import pyglet
+import board
+import cell
+
+MIN_SCALE = 0.25
+MAX_SCALE = 4.0
+
+def tileName(value):
+    """
+    Returns the name of the image that shows a cell in the given state.
+    Params:
+        value: The state byte of the cell.
+    """
+    if not value & board.VISIBLE:
+        if value & board.FLAG:
+            return "flag"
+        return "hidden"
+    if value & board.MINE:
+        return "mine"
+    return str(value & board.NEIGHBOURS)
+
+#The image name of every possible state byte.
+TILE_NAMES = [tileName(value) for value in range(256)]
+
+class Viewport:
+    """
+    A camera over the minefield. Only the cells inside the window have sprites.
+    The sprites are pooled and bound to other cells as the view is panned or zoomed,
+    so the number of sprites depends on the window size, not on the minefield size.
+    """
+    def __init__(self, gridRef, width, height, scale = 1.0):
+        """
+        The constructor initializes variables and creates the sprite pool.
+        Params:
+            gridRef: A reference to the grid being viewed.
+            width: Width of the window in pixels.
+            height: Height of the window in pixels.
+            scale: Scales the sprites by a factor.
+        """
+        self.master = gridRef
+        self.board = gridRef.board
+        self.width = width
+        self.height = height
+        self.scale = min(max(scale, MIN_SCALE), MAX_SCALE)
+        #Minefield pixel coordinates of the lower left corner of the window.
+        self.x = 0.0
+        self.y = 0.0
+        self.columns = 0
+        self.rows = 0
+        self.firstX = 0
+        self.firstY = 0
+        self.sprites = []
+        self.names = []
+
+        self.resize()
+
+    def cellWidth(self):
+        """
+        Returns the width of a cell in pixels at the current scale.
+        """
+        return cell.SPRITE_WIDTH * self.scale
+
+    def cellHeight(self):
+        """
+        Returns the height of a cell in pixels at the current scale.
+        """
+        return cell.SPRITE_HEIGHT * self.scale
+
+    def resize(self):
+        """
+        Grows or shrinks the sprite pool to cover the window at the current scale
+        and lays it out again.
+        """
+        self.columns = int(math.ceil(self.width / self.cellWidth())) + 1
+        self.rows = int(math.ceil(self.height / self.cellHeight())) + 1
+        count = self.columns * self.rows
+
+        while len(self.sprites) > count:
+            self.sprites.pop().delete()
+        while len(self.sprites) < count:
+            self.sprites.append(pyglet.sprite.Sprite(
+                self.master.getImage("hidden"),
+                batch = self.master.drawBuffer))
+        self.names = [None] * count
+
+        self.clamp()
+        self.layout()
+
+    def clamp(self):
+        """
+        Keeps the view inside the minefield. A minefield smaller than the window
+        is centered instead.
+        """
+        fieldWidth = self.board.width * self.cellWidth()
+        fieldHeight = self.board.height * self.cellHeight()
+        if fieldWidth <= self.width:
+            self.x = (fieldWidth - self.width) / 2
+        else:
+            self.x = min(max(self.x, 0), fieldWidth - self.width)
+        if fieldHeight <= self.height:
+            self.y = (fieldHeight - self.height) / 2
+        else:
+            self.y = min(max(self.y, 0), fieldHeight - self.height)
+
+    def layout(self):
+        """
+        Positions every pooled sprite and binds it to the cell under it.
+        """
+        cellWidth = self.cellWidth()
+        cellHeight = self.cellHeight()
+        self.firstX = int(math.floor(self.x / cellWidth))
+        self.firstY = int(math.floor(self.y / cellHeight))
+
+        slot = 0
+        for j in range(self.rows):
+            cy = self.firstY + j
+            for i in range(self.columns):
+                cx = self.firstX + i
+                sprite = self.sprites[slot]
+                sprite.update(
+                    x = cx * cellWidth - self.x,
+                    y = cy * cellHeight - self.y,
+                    scale = self.scale)
+                if 0 <= cx < self.board.width and 0 <= cy < self.board.height:
+                    sprite.visible = True
+                    self.bind(slot, self.board.index(cx, cy))
+                else:
+                    sprite.visible = False
+                slot += 1
+
+        self.master.isDirty = True
+
+    def bind(self, slot, index):
+        """
+        Sets the image of a pooled sprite to match the state of a cell. All images
+        are regions of the same atlas texture, so the sprite keeps its texture and
+        group and only its texture coordinates are rewritten.
+        Params:
+            slot: Index of the sprite in the pool.
+            index: Flat index of the cell.
+        """
+        name = TILE_NAMES[self.board.state[index]]
+        if self.names[slot] != name:
+            self.names[slot] = name
+            self.sprites[slot].image = self.master.getImage(name)
+
+    def center(self, x, y):
+        """
+        Moves the view so that a cell is in the middle of the window.
+        Params:
+            x: X location of the cell.
+            y: Y location of the cell.
+        """
+        self.x = (x + 0.5) * self.cellWidth() - self.width / 2
+        self.y = (y + 0.5) * self.cellHeight() - self.height / 2
+        self.clamp()
+        self.layout()
+
+    def pan(self, dx, dy):
+        """
+        Moves the view by a number of pixels.
+        """
+        self.x += dx
+        self.y += dy
+        self.clamp()
+        self.layout()
+
+    def zoom(self, factor, anchorX, anchorY):
+        """
+        Scales the view by a factor while keeping the point under the anchor in place.
+        Params:
+            factor: The factor the current scale is multiplied by.
+            anchorX: X location of the anchor in the window.
+            anchorY: Y location of the anchor in the window.
+        """
+        scale = min(max(self.scale * factor, MIN_SCALE), MAX_SCALE)
+        self.x = (self.x + anchorX) * scale / self.scale - anchorX
+        self.y = (self.y + anchorY) * scale / self.scale - anchorY
+        self.scale = scale
+        self.resize()
+
+    def cellAt(self, x, y):
+        """
+        Returns the (x, y) coordinates of the cell under a window location,
+        or None if there is no cell there.
+        """
+        cx = int(math.floor((x + self.x) / self.cellWidth()))
+        cy = int(math.floor((y + self.y) / self.cellHeight()))
+        if 0 <= cx < self.board.width and 0 <= cy < self.board.height:
+            return cx, cy
+        return None
+
+    def updateSpans(self, spans):
+        """
+        Rebinds the sprites of the cells in a list of (start, stop) spans of flat
+        indices. Only the part of each span inside the view is visited.
+        """
+        width = self.board.width
+        firstX = max(self.firstX, 0)
+        lastX = min(self.firstX + self.columns, width)
+        firstY = max(self.firstY, 0)
+        lastY = min(self.firstY + self.rows, self.board.height)
+
+        for start, stop in spans:
+            for row in range(max(start // width, firstY), min((stop - 1) // width + 1, lastY)):
+                rowStart = row * width
+                slotStart = (row - self.firstY) * self.columns - self.firstX
+                for index in range(max(start, rowStart + firstX), min(stop, rowStart + lastX)):
+                    self.bind(slotStart + index - rowStart, index)
+
+        self.master.isDirty = True
+
+    def refresh(self):
+        """
+        Rebinds every pooled sprite without moving the view.
+        """
+        self.updateSpans([(0, self.board.size)])